@@ -0,0 +1,71 @@
+# Benchmark: contour-loop detect_ball vs connected-component detect_ball_cc
+# usage: python bench_ball_detect.py [image.jpg ...]
+# with no images it generates cluttered synthetic frames (one ball + lots of colored junk)
+
+import sys
+import time
+import contextlib
+import io
+import cv2
+import numpy as np
+
+from locate_refactored import process_image, detect_ball, lower_orange, upper_orange, kernel
+from ball_detection import build_ball_mask, detect_ball_cc
+
+REPEATS = 50
+CLUTTER_LEVELS = [0, 100, 500, 1500, 3000]
+
+def synthetic_frame(n_clutter, rng, size=(720, 1280)):
+    img = np.full((size[0], size[1], 3), 190, dtype=np.uint8)
+    for _ in range(n_clutter):
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        center = (int(rng.integers(0, size[1])), int(rng.integers(0, size[0])))
+        if rng.random() < 0.5:
+            axes = (int(rng.integers(2, 12)), int(rng.integers(2, 12)))
+            cv2.ellipse(img, center, axes, float(rng.integers(0, 180)), 0, 360, color, -1)
+        else:
+            cv2.circle(img, center, int(rng.integers(1, 4)), color, -1)
+    # the ball itself, radius ~3 px after the 0.5 resize
+    cv2.circle(img, (int(size[1] * 0.4), int(size[0] * 0.6)), 7, (0, 120, 255), -1)
+    return img
+
+
+def time_engine(fn, hsv_img, color_img):
+    result = None
+    with contextlib.redirect_stdout(io.StringIO()): # detect_ball prints every candidate
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            result = fn(hsv_img, color_img, lower_orange, upper_orange, kernel)
+        elapsed = time.perf_counter() - start
+    return 1000 * elapsed / REPEATS, result
+
+
+def run(name, raw_img):
+    color_img, _, hsv_img = process_image(raw_img, scale_factor=0.5)
+    # blobs left in the mask after erode/dilate = how many contours detect_ball has to loop over
+    n_blobs = len(cv2.findContours(build_ball_mask(hsv_img, lower_orange, upper_orange, kernel),
+                                   cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0])
+    t_contour, (p_contour, f_contour) = time_engine(detect_ball, hsv_img, color_img.copy())
+    t_cc, (p_cc, f_cc) = time_engine(detect_ball_cc, hsv_img, color_img.copy())
+    agree = f_contour == f_cc and (not f_contour or np.abs(p_contour - p_cc).max() <= 1)
+    print(f"{name:>16} | {n_blobs:6d} | {t_contour:9.2f} | {t_cc:9.2f} | {t_contour / t_cc:6.1f}x | "
+          f"{'yes' if agree else 'NO'}")
+
+
+def main():
+    print(f"{'frame':>16} | {'blobs':>6} | {'contour ms':>9} | {'cc ms':>9} | {'speedup':>7} | same result")
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            img = cv2.imread(path)
+            if img is None:
+                print(f"couldn't read {path}")
+                continue
+            run(path[-16:], img)
+    else:
+        rng = np.random.default_rng(0)
+        for n_clutter in CLUTTER_LEVELS:
+            run(f"clutter {n_clutter}", synthetic_frame(n_clutter, rng))
+
+
+if __name__ == "__main__":
+    main()
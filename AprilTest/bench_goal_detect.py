@@ -0,0 +1,104 @@
+# Offline benchmark of the goal camera's GoalDetector: replays a recording (RECORD_TO in
+# Goal_Final.py) at max speed and reports per-frame latency percentiles, FPS and the
+# goal / miss events. Frame times come from the recording, so lock durations behave
+# like they did live. --instances N runs N independent detectors on every frame,
+# --no-gate turns the motion gate off to compare against the ungated pipeline.
+#
+# usage: python bench_goal_detect.py [goal_session.avi] [--instances N] [--frames N] [--no-gate]
+# with no recording it generates a clip of shots: one into the goal, one wide, one bouncing high
+# and a fast one that is only seen above the top line and then past the left post
+
+import argparse
+import time
+import cv2
+import numpy as np
+
+from frame_source import open_source
+from goal_detection import GoalDetector
+from motion_gate import MotionGate
+
+SYNTHETIC_FPS = 30.0
+
+
+def synthetic_clip(size=(480, 640)):
+    """(frames, times): four shots at a 640x480 goal camera, 8 s of idle between them"""
+    height, width = size
+    # (start, end, frames to get there)
+    shots = [((320, -20), (330, 300), 20),   # straight into the goal
+             ((100, -20), (60, 350), 20),    # wide left, MISS
+             ((500, -20), (520, 50), 20),    # stays above the top line
+             ((250, 50), (60, 400), 2)]      # fast: crosses the top line between the posts,
+                                             # next seen left of the left post -> still a GOAL
+    frames, times = [], []
+    t = 0.0
+    for start, end, steps in shots:
+        for i in range(int(8 * SYNTHETIC_FPS)):
+            frame = np.full((height, width, 3), 60, dtype=np.uint8)
+            k = min(1.0, i / steps)
+            x, y = int(start[0] + k * (end[0] - start[0])), int(start[1] + k * (end[1] - start[1]))
+            if i < 40:
+                cv2.circle(frame, (x, y), 15, (0, 120, 255), -1)
+            frames.append(frame)
+            times.append(t)
+            t += 1 / SYNTHETIC_FPS
+    return frames, times
+
+
+def frames_from(path, max_frames):
+    cap = open_source(path, speed="max")
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open recording {path}")
+    while max_frames is None or max_frames > 0:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame, cap.frame_time
+        if max_frames is not None:
+            max_frames -= 1
+    cap.release()
+
+
+def run(frames, instances, gate=True):
+    detectors = [GoalDetector(motion_gate=MotionGate() if gate else None) for _ in range(instances)]
+    times = []
+    events = []
+    for frame, t in frames:
+        t0 = time.perf_counter()
+        for i, detector in enumerate(detectors):
+            for event in detector.process(frame, t):
+                events.append((i, event))
+        times.append(time.perf_counter() - t0)
+    return np.asarray(times), events, detectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GoalDetector on a recording")
+    parser.add_argument("recording", nargs="?", help="goal camera recording (synthetic shots if omitted)")
+    parser.add_argument("--instances", type=int, default=1, help="independent detectors per frame")
+    parser.add_argument("--frames", type=int, default=None, help="stop after this many frames")
+    parser.add_argument("--no-gate", action="store_true", help="run the ball pipeline on every frame")
+    args = parser.parse_args()
+
+    if args.recording:
+        frames = frames_from(args.recording, args.frames)
+    else:
+        clip, clip_times = synthetic_clip()
+        frames = list(zip(clip, clip_times))[:args.frames]
+
+    times, events, detectors = run(frames, args.instances, gate=not args.no_gate)
+    if len(times) == 0:
+        print("no frames read")
+        return
+    ms = 1000 * times
+    print(f"{len(times)} frames, {args.instances} detector(s)")
+    print(f"per frame: p50 {np.percentile(ms, 50):.2f} ms | p90 {np.percentile(ms, 90):.2f} ms | "
+          f"p99 {np.percentile(ms, 99):.2f} ms | max {ms.max():.2f} ms | {len(times) / times.sum():.1f} fps")
+    if detectors[0].motion_gate is not None:
+        print(f"skipped by the motion gate: {detectors[0].skipped}/{detectors[0].frames} frames")
+    for i, event in events:
+        where = f" at {event.position}" if event.position is not None else ""
+        print(f"  detector {i}: {event.status} t={event.t:.2f}s{where}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Offline benchmark of the locator: replays a recording (see frame_source.py / RECORD_TO in
+# locate_refactored.py) at max speed through process_image -> detect_apriltags -> detect_ball
+# -> calculate_poses and reports per-stage latency percentiles and FPS. No camera or field needed.
+#
+# usage: python bench_pipeline.py session.avi [--engine contours|cc] [--track-tags] [--frames N]
+
+import argparse
+import contextlib
+import io
+import time
+import numpy as np
+
+from frame_source import open_source
+from locate_refactored import (process_image, detect_apriltags, detect_ball, detect_balls, calculate_poses,
+                               target_points, lower_orange, upper_orange, kernel)
+from ball_detection import detect_ball_cc
+from homography import HomographyManager
+from tag_tracking import RoiTagTracker
+from tag_registry import DEFAULT_REGISTRY
+import pyapriltags as apriltag
+
+STAGES = ["read", "process_image", "detect_apriltags", "detect_ball", "calculate_poses", "total"]
+
+
+def percentiles_ms(samples):
+    ms = 1000 * np.asarray(samples)
+    return np.percentile(ms, 50), np.percentile(ms, 90), np.percentile(ms, 99), ms.max()
+
+
+def run(path, engine="contours", track_tags=False, max_frames=None):
+    cap = open_source(path, speed="max")
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open recording {path}")
+
+    detector = apriltag.Detector()
+    tag_tracker = RoiTagTracker(detector) if track_tags else None
+    ball_detector = detect_ball_cc if engine == "cc" else detect_ball
+    homography = HomographyManager(target_points, path=None) # don't touch the saved H
+
+    control_points = np.zeros((4, 2), dtype=np.float32)
+    robot_points = DEFAULT_REGISTRY.new_robot_points()
+    times = {stage: [] for stage in STAGES}
+    poses = 0
+
+    # the stages print as they go, keep that out of the report and the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        while max_frames is None or len(times["total"]) < max_frames:
+            t0 = time.perf_counter()
+            ret, raw_color_img = cap.read()
+            if not ret:
+                break
+            t1 = time.perf_counter()
+            color_img, grayscale_img, hsv_img = process_image(raw_color_img, scale_factor=0.5)
+            t2 = time.perf_counter()
+            # overlays off (color_img=None), as in headless production runs
+            if tag_tracker is not None:
+                control_tag_count, robots_found = tag_tracker.detect(grayscale_img, None, control_points, robot_points)
+            else:
+                control_tag_count, robots_found = detect_apriltags(grayscale_img, detector, None, control_points, robot_points)
+            t3 = time.perf_counter()
+            ball_points = detect_balls(hsv_img, None, ball_detector, lower_orange, upper_orange, kernel)
+            t4 = time.perf_counter()
+            H = homography.update(control_points, control_tag_count)
+            if H is not None:
+                calculate_poses(H, robot_points, ball_points)
+                poses += 1
+            t5 = time.perf_counter()
+
+            for stage, dt in zip(STAGES, (t1 - t0, t2 - t1, t3 - t2, t4 - t3, t5 - t4, t5 - t0)):
+                times[stage].append(dt)
+    cap.release()
+    return times, poses
+
+
+def report(times, poses):
+    n = len(times["total"])
+    if n == 0:
+        print("no frames read")
+        return
+    print(f"{n} frames, {poses} poses")
+    print(f"{'stage':>17} | {'p50 ms':>7} | {'p90 ms':>7} | {'p99 ms':>7} | {'max ms':>7} | {'fps':>7}")
+    for stage in STAGES:
+        p50, p90, p99, worst = percentiles_ms(times[stage])
+        fps = len(times[stage]) / sum(times[stage]) if sum(times[stage]) > 0 else float("inf")
+        print(f"{stage:>17} | {p50:7.2f} | {p90:7.2f} | {p99:7.2f} | {worst:7.2f} | {fps:7.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the AprilTag locator on a recording")
+    parser.add_argument("recording")
+    parser.add_argument("--engine", choices=["cc", "contours"], default="contours", help="ball detector")
+    parser.add_argument("--track-tags", action="store_true", help="use RoiTagTracker instead of full-frame detection")
+    parser.add_argument("--frames", type=int, default=None, help="stop after this many frames")
+    args = parser.parse_args()
+
+    times, poses = run(args.recording, args.engine, args.track_tags, args.frames)
+    report(times, poses)
+
+
+if __name__ == "__main__":
+    main()
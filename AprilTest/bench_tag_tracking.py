@@ -0,0 +1,144 @@
+# Offline benchmark of the tag trackers against full-frame detection: replays a recording
+# at max speed, runs detect_apriltags on every frame as the reference and each tracker
+# (RoiTagTracker, FlowTagTracker) on the same frames, and reports the tag stage's latency,
+# the speedup over full detection, and the robot pose error against the reference (cm / deg).
+#
+# usage: python bench_tag_tracking.py [session.avi] [--trackers roi,flow] [--full-every N] [--frames N]
+# with no recording it renders a clip of the robot tag driving and turning across the field
+
+import argparse
+import contextlib
+import io
+import math
+import time
+import cv2
+import numpy as np
+
+from locate_refactored import process_image, detect_apriltags, calculate_poses, target_points, SCALE_FACTOR
+from homography import HomographyManager
+from tag_tracking import make_tag_tracker
+from tag_registry import DEFAULT_REGISTRY
+from bench_pipeline import percentiles_ms
+from bench_goal_detect import frames_from
+import pyapriltags as apriltag
+
+SYNTHETIC_FRAMES = 300
+NO_BALLS = np.empty((0, 2), dtype=np.float32)
+
+
+def render_tag(tag_id, size):
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_APRILTAG_36h11)
+    marker = cv2.aruco.generateImageMarker(dictionary, tag_id, size)
+    return cv2.copyMakeBorder(marker, size // 8, size // 8, size // 8, size // 8, cv2.BORDER_CONSTANT, value=255)
+
+
+def synthetic_clip(n_frames=SYNTHETIC_FRAMES, size=(720, 1280)):
+    """1280x720 frames: control tags 0-3 in the corners, robot tag 4 on a loop, turning as it goes"""
+    height, width = size
+    # cv2's seeded RNG, not numpy.random: the repo's secrets.py shadows the stdlib module numpy.random needs
+    cv2.setRNGSeed(0)
+    field = np.full((height, width, 3), 190, dtype=np.uint8)
+    texture = np.empty_like(field)
+    cv2.randu(texture, (0, 0, 0), (20, 20, 20))
+    field += texture # some texture for the flow to not lock onto
+    for tag_id, (x, y) in enumerate([(60, height - 160), (width - 160, height - 160), (width - 160, 60), (60, 60)]):
+        tag = render_tag(tag_id, 80)
+        field[y:y + tag.shape[0], x:x + tag.shape[1]] = tag[..., None]
+
+    robot = render_tag(4, 100)
+    side = int(robot.shape[0] * 1.5)
+    pad = (side - robot.shape[0]) // 2
+    robot = cv2.copyMakeBorder(robot, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=255)
+    for i in range(n_frames):
+        t = i / n_frames
+        cx = width / 2 + 330 * math.cos(2 * math.pi * t)
+        cy = height / 2 + 150 * math.sin(4 * math.pi * t)
+        angle = 360 * t
+        M = cv2.getRotationMatrix2D((robot.shape[1] / 2, robot.shape[0] / 2), angle, 1.0)
+        turned = cv2.warpAffine(robot, M, robot.shape[::-1], flags=cv2.INTER_LINEAR, borderValue=255)
+        frame = field.copy()
+        x, y = int(cx) - robot.shape[1] // 2, int(cy) - robot.shape[0] // 2
+        frame[y:y + robot.shape[0], x:x + robot.shape[1]] = turned[..., None]
+        noise = np.empty(frame.shape, dtype=np.float32)
+        cv2.randn(noise, (0, 0, 0), (3, 3, 3))
+        yield np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+
+def run(frames, kinds, full_every):
+    registry = DEFAULT_REGISTRY
+    name = registry.primary
+    reference_detector = apriltag.Detector()
+    reference_points = (np.zeros((4, 2), dtype=np.float32), registry.new_robot_points())
+    homography = HomographyManager(target_points, path=None) # don't touch the saved H
+
+    trackers = {kind: make_tag_tracker(kind, apriltag.Detector(), full_every[kind], registry) for kind in kinds}
+    points = {kind: (np.zeros((4, 2), dtype=np.float32), registry.new_robot_points()) for kind in kinds}
+    times = {kind: [] for kind in ["full"] + kinds}
+    errors = {kind: [] for kind in kinds}   # (position cm, theta deg) per frame both found the robot
+    lost = {kind: 0 for kind in kinds}      # frames the reference found the robot and the tracker didn't
+
+    # the stages print as they go, keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        for raw_color_img in frames:
+            _, grayscale_img, _ = process_image(raw_color_img, scale_factor=SCALE_FACTOR)
+
+            t0 = time.perf_counter()
+            control_tag_count, found = detect_apriltags(grayscale_img, reference_detector, None, *reference_points, registry)
+            times["full"].append(time.perf_counter() - t0)
+            H = homography.update(reference_points[0], control_tag_count)
+            reference = calculate_poses(H, reference_points[1], NO_BALLS)[0][name] if H is not None and name in found else None
+
+            for kind, tracker in trackers.items():
+                t0 = time.perf_counter()
+                _, tracked = tracker.detect(grayscale_img, None, *points[kind])
+                times[kind].append(time.perf_counter() - t0)
+                if reference is None:
+                    continue
+                if name not in tracked:
+                    lost[kind] += 1
+                    continue
+                x, y, theta = calculate_poses(H, points[kind][1], NO_BALLS)[0][name]
+                turn = (theta - reference[2] + math.pi) % (2 * math.pi) - math.pi
+                errors[kind].append((math.hypot(x - reference[0], y - reference[1]), math.degrees(abs(turn))))
+    return times, errors, lost, trackers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tag trackers against full-frame detection")
+    parser.add_argument("recording", nargs="?", help="field camera recording (synthetic clip if omitted)")
+    parser.add_argument("--trackers", default="roi,flow", help="comma separated: roi, flow")
+    parser.add_argument("--full-every", type=int, default=None,
+                        help="frames between full detections (default 30 for roi, 10 for flow as in locate_refactored.py)")
+    parser.add_argument("--frames", type=int, default=None, help="stop after this many frames")
+    args = parser.parse_args()
+
+    kinds = [kind for kind in args.trackers.split(",") if kind]
+    full_every = {kind: args.full_every or (10 if kind == "flow" else 30) for kind in kinds}
+    frames = (frame for frame, _ in frames_from(args.recording, args.frames)) if args.recording else synthetic_clip(args.frames or SYNTHETIC_FRAMES)
+
+    times, errors, lost, trackers = run(frames, kinds, full_every)
+    n = len(times["full"])
+    if n == 0:
+        print("no frames read")
+        return
+    full_p50 = percentiles_ms(times["full"])[0]
+    print(f"{n} frames, tag stage per frame (ms):")
+    print(f"{'':6} {'p50':>7} {'p90':>7} {'p99':>7} {'max':>7} {'speedup':>8}")
+    for kind in ["full"] + kinds:
+        p50, p90, p99, worst = percentiles_ms(times[kind])
+        print(f"{kind:6} {p50:7.2f} {p90:7.2f} {p99:7.2f} {worst:7.2f} {full_p50 / p50:7.1f}x")
+
+    print("robot pose error vs full detection:")
+    for kind in kinds:
+        handled = trackers[kind].summary()
+        if not errors[kind]:
+            print(f"  {kind}: no frames with the robot found by both ({handled})")
+            continue
+        position, theta = np.asarray(errors[kind]).T
+        print(f"  {kind}: position p50 {np.percentile(position, 50):.2f} cm, p99 {np.percentile(position, 99):.2f} cm, "
+              f"max {position.max():.2f} cm | theta p50 {np.percentile(theta, 50):.2f} deg, max {theta.max():.2f} deg | "
+              f"lost {lost[kind]} | {handled}")
+
+
+if __name__ == "__main__":
+    main()
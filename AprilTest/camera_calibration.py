@@ -0,0 +1,119 @@
+# Checkerboard calibration of the field camera. Saves the intrinsics that
+# locate_refactored.py uses for lens correction (UNDISTORT / CAMERA_FILE).
+#
+# live:   python camera_calibration.py --source 1
+#         hold the board in view at different positions / tilts, covering the corners of the
+#         image. SPACE grabs a view (when the board is found), C calibrates and saves, Q quits.
+# images: python camera_calibration.py --images "calib/*.jpg"
+#
+# --board is the number of INNER corners (columns x rows), --square the square size in cm.
+
+import argparse
+import glob
+import cv2
+import numpy as np
+
+from frame_source import open_source, is_replay
+from lens_correction import save_intrinsics
+
+MIN_VIEWS = 10
+SUBPIX_CRITERIA = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+
+def find_board(gray_img, board):
+    found, corners = cv2.findChessboardCorners(gray_img, board,
+                                               cv2.CALIB_CB_ADAPTIVE_THRESH | cv2.CALIB_CB_NORMALIZE_IMAGE)
+    if found:
+        corners = cv2.cornerSubPix(gray_img, corners, (11, 11), (-1, -1), SUBPIX_CRITERIA)
+    return found, corners
+
+
+def board_points(board, square):
+    # 3d corner positions on the board plane (z = 0), in cm
+    points = np.zeros((board[0] * board[1], 3), np.float32)
+    points[:, :2] = np.mgrid[0:board[0], 0:board[1]].T.reshape(-1, 2) * square
+    return points
+
+
+def calibrate(image_points, board, square, image_size, out_path):
+    object_points = [board_points(board, square)] * len(image_points)
+    rms, camera_matrix, dist_coeffs, _, _ = cv2.calibrateCamera(object_points, image_points, image_size, None, None)
+    save_intrinsics(out_path, camera_matrix, dist_coeffs, image_size, rms)
+    print(f"calibrated from {len(image_points)} views, rms reprojection error {rms:.3f} px")
+    print(f"camera matrix:\n{camera_matrix}\ndistortion: {dist_coeffs.ravel()}")
+    print(f"saved to {out_path}")
+
+
+def from_images(pattern, board, square, out_path):
+    image_points = []
+    image_size = None
+    for path in sorted(glob.glob(pattern)):
+        gray_img = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if gray_img is None:
+            continue
+        image_size = (gray_img.shape[1], gray_img.shape[0])
+        found, corners = find_board(gray_img, board)
+        print(f"{path}: {'board found' if found else 'no board'}")
+        if found:
+            image_points.append(corners)
+    if len(image_points) < MIN_VIEWS:
+        raise SystemExit(f"only {len(image_points)} usable views, need at least {MIN_VIEWS}")
+    calibrate(image_points, board, square, image_size, out_path)
+
+
+def live(source, board, square, out_path):
+    cap = open_source(source)
+    if not cap.isOpened():
+        raise SystemExit(f"Could not open camera {source}")
+    image_points = []
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                if is_replay(cap):
+                    print("end of recording")
+                    break
+                continue
+            gray_img = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            found, corners = find_board(gray_img, board)
+            cv2.drawChessboardCorners(frame, board, corners, found)
+            cv2.putText(frame, f"views: {len(image_points)}/{MIN_VIEWS}  SPACE grab  C calibrate  Q quit",
+                        (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            cv2.imshow("calibration", frame)
+
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord(" ") and found:
+                image_points.append(corners)
+                print(f"view {len(image_points)} grabbed")
+            elif key == ord("c"):
+                if len(image_points) < MIN_VIEWS:
+                    print(f"need at least {MIN_VIEWS} views, have {len(image_points)}")
+                    continue
+                calibrate(image_points, board, square, (frame.shape[1], frame.shape[0]), out_path)
+                break
+            elif key == ord("q"):
+                break
+    finally:
+        cap.release()
+        cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkerboard calibration of the field camera")
+    parser.add_argument("--source", default="1", help="camera index or recording (live mode)")
+    parser.add_argument("--images", help="glob of calibration photos instead of the live camera")
+    parser.add_argument("--board", default="9x6", help="inner corners, columns x rows")
+    parser.add_argument("--square", type=float, default=2.5, help="square size in cm")
+    parser.add_argument("--out", default="camera_intrinsics.npz")
+    args = parser.parse_args()
+
+    board = tuple(int(n) for n in args.board.lower().split("x"))
+    if args.images:
+        from_images(args.images, board, args.square, args.out)
+    else:
+        source = int(args.source) if args.source.isdigit() else args.source
+        live(source, board, args.square, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import cv2
+import numpy as np
+
+
+class ColorMask:
+    """
+    Reusable HSV mask: pixels inside any include range and outside every
+    exclude range, cleaned up with an erode/dilate (opening).
+
+    The ranges are compiled once and every intermediate buffer is allocated on
+    the first frame (or when the frame size changes) and reused after that, so
+    apply() does no per-frame allocation. The returned mask is that reused
+    buffer: copy it if you need it after the next apply().
+    """
+
+    def __init__(self, include, exclude=(), kernel=None, iterations=1):
+        self.include = [(np.array(lo), np.array(hi)) for lo, hi in include]
+        self.exclude = [(np.array(lo), np.array(hi)) for lo, hi in exclude]
+        self.kernel = kernel
+        self.iterations = iterations
+        self._shape = None
+
+    def _allocate(self, shape):
+        self._shape = shape
+        self._include_buf = np.empty(shape, dtype=np.uint8)
+        self._exclude_buf = np.empty(shape, dtype=np.uint8)
+        self._scratch = np.empty(shape, dtype=np.uint8)
+        self.mask = np.empty(shape, dtype=np.uint8)
+
+    def _union(self, hsv_img, ranges, dst):
+        lo, hi = ranges[0]
+        cv2.inRange(hsv_img, lo, hi, dst=dst)
+        for lo, hi in ranges[1:]:
+            cv2.inRange(hsv_img, lo, hi, dst=self._scratch)
+            cv2.bitwise_or(dst, self._scratch, dst=dst)
+        return dst
+
+    def apply(self, hsv_img):
+        if hsv_img.shape[:2] != self._shape:
+            self._allocate(hsv_img.shape[:2])
+
+        include = self._union(hsv_img, self.include, self._include_buf)
+        if self.exclude:
+            exclude = self._union(hsv_img, self.exclude, self._exclude_buf)
+            # both masks are 0/255, so a saturating subtract is "include AND NOT exclude" in one pass
+            cv2.subtract(include, exclude, dst=self.mask)
+        else:
+            self.mask[:] = include
+
+        if self.kernel is not None and self.iterations > 0:
+            # opening = erode x iterations then dilate x iterations, written back in place
+            cv2.morphologyEx(self.mask, cv2.MORPH_OPEN, self.kernel, dst=self.mask, iterations=self.iterations)
+        return self.mask
@@ -0,0 +1,125 @@
+import threading
+import cv2
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+MODES = ("headless", "window", "mjpeg")
+
+
+class DebugView:
+    """
+    Where the debug overlays go, and how often.
+
+    mode="headless": no drawing, no GUI calls at all (field laptop).
+    mode="window":   cv2.imshow windows, like before.
+    mode="mjpeg":    overlays are JPEG-encoded and served at
+                     http://127.0.0.1:<port>/<window name> for a browser / VLC.
+
+    Overlays are only rendered every `every` frames. Call should_draw() once
+    per frame and skip the drawing when it returns False.
+    """
+
+    def __init__(self, mode="window", every=1, port=8080, jpeg_quality=70):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.every = max(1, every)
+        self.jpeg_quality = jpeg_quality
+        self.frame_count = 0
+        self._drawing = False
+        self.server = None
+        if mode == "mjpeg":
+            self.server = MjpegServer(port)
+            self.server.start()
+            print(f"debug overlays at http://127.0.0.1:{port}/")
+
+    def should_draw(self):
+        """Advance one frame; True if this frame's overlays should be drawn"""
+        self.frame_count += 1
+        self._drawing = self.mode != "headless" and self.frame_count % self.every == 0
+        return self._drawing
+
+    def show(self, name, img):
+        if not self._drawing:
+            return
+        if self.mode == "window":
+            cv2.imshow(name, img)
+        elif self.mode == "mjpeg":
+            ok, jpeg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            if ok:
+                self.server.publish(name, jpeg.tobytes())
+
+    def poll_key(self):
+        """Key pressed in a debug window (like cv2.waitKey(1) & 0xFF), 255 if none / no windows"""
+        if self.mode != "window":
+            return 255
+        return cv2.waitKey(1) & 0xFF
+
+    def close(self):
+        if self.mode == "window":
+            cv2.destroyAllWindows()
+            cv2.waitKey(1)
+        elif self.server is not None:
+            self.server.stop()
+
+
+class MjpegServer:
+    """Serves the newest JPEG of each named stream as multipart/x-mixed-replace (MJPEG) on localhost."""
+
+    def __init__(self, port, host="127.0.0.1"):
+        self.frames = {}
+        self.cond = threading.Condition()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                name = unquote(self.path.strip("/"))
+                if not name:
+                    return self._index()
+                self.send_response(200)
+                self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+                self.end_headers()
+                last = None
+                try:
+                    while True:
+                        with server.cond:
+                            server.cond.wait_for(lambda: server.frames.get(name) is not last, timeout=5.0)
+                            jpeg = server.frames.get(name)
+                        if jpeg is None or jpeg is last:
+                            continue
+                        last = jpeg
+                        self.wfile.write(b"--frame\r\nContent-Type: image/jpeg\r\n")
+                        self.wfile.write(f"Content-Length: {len(jpeg)}\r\n\r\n".encode())
+                        self.wfile.write(jpeg + b"\r\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass # viewer closed the stream
+
+            def _index(self):
+                with server.cond:
+                    names = sorted(server.frames)
+                links = "".join(f'<p><a href="/{n}">{n}</a></p>' for n in names)
+                body = f"<html><body>{links or 'no streams yet'}</body></html>".encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass # don't print a line per request
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mjpeg", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def publish(self, name, jpeg):
+        with self.cond:
+            self.frames[name] = jpeg
+            self.cond.notify_all()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
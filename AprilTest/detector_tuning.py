@@ -0,0 +1,134 @@
+import os
+import numpy as np
+
+# (resize scale, quad_decimate) steps, best detection quality first.
+# Index 2 is what the locator always used: scale 0.5 and the detector's default decimation.
+LEVELS = [(0.75, 1.0), (0.6, 1.5), (0.5, 2.0), (0.4, 2.0), (0.3, 2.0), (0.3, 3.0)]
+DEFAULT_LEVEL = 2
+
+
+# change an apriltag.Detector's decimation / thread count in place, no need to rebuild it
+def configure_detector(detector, quad_decimate, nthreads):
+    detector.tag_detector_ptr.contents.quad_decimate = float(quad_decimate)
+    detector.tag_detector_ptr.contents.nthreads = int(nthreads)
+    detector.params["quad_decimate"] = quad_decimate
+    detector.params["nthreads"] = nthreads
+
+
+class AutoTuner:
+    """
+    Picks resize scale, quad_decimate and detector threads from measured frame
+    latency and detection success, so the locator fits a frame budget on slow
+    and fast laptops alike.
+
+    Every `window` frames it looks at the p90 latency and the mean detection
+    score (fraction of the tags / robot / ball found per frame):
+      - over budget: add a detector thread, or once at max_threads step to a
+        cheaper level
+      - under headroom * budget: step back to a better level, unless that
+        level recently blew the budget
+      - a cheaper step that scores below min_success * the previous window's
+        score is undone, and that level is left alone for a while
+    The score is only compared across a step, so a ball that's simply not on
+    the field doesn't count against a level. Both bans run out after
+    `ban_windows` windows, so one slow or unlucky window (a background job,
+    the ball briefly hidden) doesn't rule a level out for the whole session.
+    """
+
+    def __init__(self, budget=0.033, levels=LEVELS, start_level=DEFAULT_LEVEL, max_threads=None, window=30,
+                 headroom=0.7, min_success=0.9, settle_windows=3, ban_windows=20):
+        self.budget = budget
+        self.levels = levels
+        self.level = start_level
+        self.nthreads = 1
+        # leave a core for the capture / publish threads
+        self.max_threads = max_threads or max(1, (os.cpu_count() or 2) - 1)
+        self.window = window
+        self.headroom = headroom
+        self.min_success = min_success
+        self.settle_windows = settle_windows
+        self.ban_windows = ban_windows
+
+        self.ceiling = 0                  # best level known to fit the budget
+        self.floor = len(levels) - 1      # cheapest level known to keep detections
+        self.ceiling_age = 0              # windows since the ceiling / floor were last raised / lowered
+        self.floor_age = 0
+        self.latencies = []
+        self.scores = []
+        self.last_move = None
+        self.prev_score = None
+        self.stable = 0
+        self.changes = 0
+
+    def settings(self):
+        """(scale, quad_decimate, nthreads) to run with"""
+        scale, quad_decimate = self.levels[self.level]
+        return scale, quad_decimate, self.nthreads
+
+    def record(self, latency_s, score):
+        """Feed one frame's latency and detection score (0..1). Returns True if the settings changed."""
+        self.latencies.append(latency_s)
+        self.scores.append(float(score))
+        if len(self.latencies) < self.window:
+            return False
+
+        p90 = float(np.percentile(self.latencies, 90))
+        score = float(np.mean(self.scores))
+        self.latencies = []
+        self.scores = []
+
+        self._age_bans()
+        move = self._step(p90, score)
+        self.last_move = move
+        self.prev_score = score
+        if move is not None:
+            self.changes += 1
+            self.stable = 0
+            scale, quad_decimate, nthreads = self.settings()
+            print(f"auto-tune: p90 {1000 * p90:.1f} ms, score {score:.0%} -> "
+                  f"scale {scale}, quad_decimate {quad_decimate}, nthreads {nthreads}")
+        else:
+            self.stable += 1
+            if self.stable == self.settle_windows:
+                print(f"auto-tune settled: {self.summary()} (p90 {1000 * p90:.1f} ms / budget "
+                      f"{1000 * self.budget:.0f} ms, score {score:.0%})")
+        return move is not None
+
+    def _age_bans(self):
+        if self.ceiling > 0:
+            self.ceiling_age += 1
+            if self.ceiling_age > self.ban_windows:
+                print(f"auto-tune: level {self.ceiling - 1} may fit the budget again")
+                self.ceiling = 0
+        if self.floor < len(self.levels) - 1:
+            self.floor_age += 1
+            if self.floor_age > self.ban_windows:
+                print(f"auto-tune: level {self.floor + 1} may keep the detections again")
+                self.floor = len(self.levels) - 1
+
+    def _step(self, p90, score):
+        """Adjust the settings for the last window; returns what changed ("threads", "cheaper", "better") or None"""
+        if self.last_move == "cheaper" and score < self.min_success * self.prev_score:
+            # this level is too coarse to find what the last one found, don't come back down here
+            self.floor = self.level - 1
+            self.floor_age = 0
+            self.level -= 1
+            return "better"
+        if p90 > self.budget:
+            if self.nthreads < self.max_threads:
+                self.nthreads += 1
+                return "threads"
+            if self.level < self.floor:
+                self.ceiling = max(self.ceiling, self.level + 1)
+                self.ceiling_age = 0
+                self.level += 1
+                return "cheaper"
+            return None # cheapest usable settings, nothing left to give
+        if p90 < self.headroom * self.budget and self.level > self.ceiling:
+            self.level -= 1
+            return "better"
+        return None
+
+    def summary(self):
+        scale, quad_decimate, nthreads = self.settings()
+        return f"scale {scale}, quad_decimate {quad_decimate}, nthreads {nthreads}"
@@ -0,0 +1,71 @@
+import cv2
+import numpy as np
+
+
+class FieldRoi:
+    """
+    Where the taped field is in the image, for restricting the ball search.
+
+    The field corners (cm, the homography's target points), pushed out by
+    `margin` cm, go through the inverse homography to image pixels. That
+    polygon's bounding box is the part of the frame worth thresholding, and a
+    filled polygon mask of the box's size removes what's left outside the
+    field (people, chairs) before blobs are measured. Both are cached and only
+    rebuilt when H, the scale or the frame size change.
+
+    In UNDISTORT="points" mode the frame is still distorted while H is not,
+    so the polygon edges are off by the (small) distortion; the margin
+    covers that.
+    """
+
+    def __init__(self, field_points, margin=5.0):
+        field_points = np.asarray(field_points, dtype=np.float32)
+        center = field_points.mean(axis=0)
+        self.field_points = field_points + np.sign(field_points - center) * margin
+
+        self.H = None          # homography the cached ROI was built from
+        self.scale = None
+        self.shape = None
+        self.x0 = 0
+        self.y0 = 0
+        self.mask = None       # polygon mask of the bounding box, 255 inside
+        self.polygon = None    # polygon corners in frame pixels, for drawing
+        self.rebuilds = 0
+
+    def region(self, H, scale, shape):
+        """(x0, y0, mask) for a frame of `shape` whose pixels are H's pixels * scale, or None without an H.
+        mask covers frame[y0:y0 + mask.shape[0], x0:x0 + mask.shape[1]] and is empty if the field is off-screen."""
+        if H is None:
+            return None
+        if self.H is None or scale != self.scale or shape[:2] != self.shape or not np.array_equal(H, self.H):
+            self._build(H, scale, shape[:2])
+        return self.x0, self.y0, self.mask
+
+    def _build(self, H, scale, shape):
+        self.H = H.copy()
+        self.scale = scale
+        self.shape = shape
+        self.rebuilds += 1
+
+        pixels = cv2.perspectiveTransform(self.field_points.reshape(-1, 1, 2), np.linalg.inv(H)).reshape(-1, 2) * scale
+        self.polygon = pixels
+        height, width = shape
+        x0, y0 = np.clip(np.floor(pixels.min(axis=0)).astype(int), 0, (width, height))
+        x1, y1 = np.clip(np.ceil(pixels.max(axis=0)).astype(int) + 1, 0, (width, height))
+        if x1 <= x0 or y1 <= y0:
+            self.x0, self.y0 = int(x0), int(y0)
+            self.mask = np.zeros((0, 0), dtype=np.uint8)
+            return
+        # keep the box an even size where the frame allows, connectedComponents (CCL_GRANA)
+        # is 2-3x slower on odd heights
+        if (x1 - x0) % 2:
+            x1, x0 = (x1 + 1, x0) if x1 < width else (x1, max(0, x0 - 1))
+        if (y1 - y0) % 2:
+            y1, y0 = (y1 + 1, y0) if y1 < height else (y1, max(0, y0 - 1))
+        self.x0, self.y0 = int(x0), int(y0)
+        self.mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(self.mask, [np.round(pixels - (x0, y0)).astype(np.int32)], 255)
+
+    def draw(self, color_img):
+        if self.polygon is not None:
+            cv2.polylines(color_img, [np.round(self.polygon).astype(np.int32)], True, (255, 255, 0), 1)
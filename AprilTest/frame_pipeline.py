@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+
+
+# wall-clock (unix) time of a time.perf_counter() reading, for stamping messages
+# that leave this machine. perf_counter is used inside the pipeline since it's monotonic.
+def wall_time(t_perf):
+    return time.time() - (time.perf_counter() - t_perf)
+
+
+class LatestSlot:
+    """
+    One-item mailbox between pipeline stages.
+
+    put() overwrites whatever is waiting, so a slow consumer always gets the
+    newest item and stale ones are dropped (and counted) instead of queued.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._has_item = False
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._has_item:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        """Wait for the next item. Returns None on timeout or once closed."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._has_item or self.closed, timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def drained(self):
+        """Closed and the last item has been taken"""
+        with self._cond:
+            return self.closed and not self._has_item
+
+
+class StageStats:
+    """Throughput and latency bookkeeping for one pipeline stage."""
+
+    def __init__(self, name, window=120):
+        self.name = name
+        self.count = 0
+        self.busy = deque(maxlen=window)     # seconds spent working per item
+        self.latency = deque(maxlen=window)  # seconds from capture to end of stage
+        self._lock = threading.Lock()
+        self._window_start = time.perf_counter()
+        self._window_count = 0
+
+    def record(self, busy_s, latency_s=None):
+        with self._lock:
+            self.count += 1
+            self._window_count += 1
+            self.busy.append(busy_s)
+            if latency_s is not None:
+                self.latency.append(latency_s)
+
+    def fps(self):
+        """Items per second since the last call to fps()."""
+        with self._lock:
+            now = time.perf_counter()
+            elapsed = now - self._window_start
+            rate = self._window_count / elapsed if elapsed > 0 else 0.0
+            self._window_start, self._window_count = now, 0
+            return rate
+
+    def summary(self):
+        fps = self.fps()
+        with self._lock:
+            busy = list(self.busy)
+            latency = list(self.latency)
+        text = f"{self.name}: {fps:5.1f} fps"
+        if busy:
+            text += f" | work {1000 * sum(busy) / len(busy):6.1f} ms"
+        if latency:
+            text += f" | age {1000 * sum(latency) / len(latency):6.1f} ms (max {1000 * max(latency):6.1f})"
+        return text
+
+
+class CaptureThread(threading.Thread):
+    """
+    Reads frames from `cap` as fast as the camera delivers them and keeps only
+    the newest one in `slot` as (seq, capture_time, frame).
+
+    A live camera's failed read is retried. With live=False (a recording) it
+    means the end: the thread closes `slot` and stops, so consumers see
+    slot.closed instead of waiting for frames forever.
+    """
+
+    def __init__(self, cap, slot, stats=None, live=True):
+        super().__init__(name="capture", daemon=True)
+        self.cap = cap
+        self.slot = slot
+        self.stats = stats or StageStats("capture")
+        self.live = live
+        self.running = True
+        self.seq = 0
+
+    def run(self):
+        while self.running:
+            t0 = time.perf_counter()
+            ret, frame = self.cap.read()
+            t_capture = time.perf_counter()
+            if not ret:
+                if not self.live:
+                    print("end of recording")
+                    self.running = False
+                    self.slot.close()
+                    break
+                print("couldn't capture frame, continuing")
+                time.sleep(0.1)
+                continue
+            self.seq += 1
+            self.slot.put((self.seq, t_capture, frame))
+            self.stats.record(t_capture - t0)
+
+    def stop(self):
+        self.running = False
+
+
+class PublishThread(threading.Thread):
+    """
+    Takes (seq, capture_time, result) items from `slot` and hands the result to
+    `publish_fn`. Like the other stages it only ever sees the newest result.
+    """
+
+    def __init__(self, slot, publish_fn, stats=None):
+        super().__init__(name="publish", daemon=True)
+        self.slot = slot
+        self.publish_fn = publish_fn
+        self.stats = stats or StageStats("publish")
+
+    def run(self):
+        while True:
+            item = self.slot.get(timeout=0.5)
+            if item is None:
+                if self.slot.closed:
+                    return
+                continue
+            seq, t_capture, result = item
+            t0 = time.perf_counter()
+            self.publish_fn(result)
+            t1 = time.perf_counter()
+            self.stats.record(t1 - t0, t1 - t_capture)
+
+
+def report_stats(stages, frame_slot=None, result_slot=None):
+    """Print one line per stage plus how many frames/results were dropped as stale."""
+    for stats in stages:
+        print("  " + stats.summary())
+    dropped = []
+    if frame_slot is not None:
+        dropped.append(f"frames {frame_slot.dropped}")
+    if result_slot is not None:
+        dropped.append(f"results {result_slot.dropped}")
+    if dropped:
+        print("  dropped stale: " + ", ".join(dropped))
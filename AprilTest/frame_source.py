@@ -0,0 +1,167 @@
+# Frame sources for the vision scripts: live camera, recording a live session, replaying a recording.
+# Everything returned by open_source() has the cv2.VideoCapture methods the scripts use
+# (read, isOpened, release, set, get), so it drops in where cv2.VideoCapture(index) was.
+
+import os
+import time
+import cv2
+
+
+def timestamps_path(video_path):
+    return os.path.splitext(video_path)[0] + "_timestamps.txt"
+
+
+class ReplaySource:
+    """
+    Plays back a recording made by RecordingSource.
+
+    speed="native" paces frames by their recorded capture times (or the file's
+    fps if there is no timestamps file), speed="max" returns them as fast as
+    they decode, for benchmarking. loop=True starts over at the end.
+    """
+
+    def __init__(self, path, speed="native", loop=False):
+        if speed not in ("native", "max"):
+            raise ValueError(f"speed must be 'native' or 'max', not {speed!r}")
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+
+        self.timestamps = None
+        ts_path = timestamps_path(path)
+        if os.path.exists(ts_path):
+            with open(ts_path) as f:
+                self.timestamps = [float(line) for line in f if line.strip()]
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+        self.index = 0
+        self.start_wall = None
+        self.frame_time = None # recording time (s) of the last frame read, for replaying at "max" speed
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _frame_time(self, index):
+        if self.timestamps is not None and index < len(self.timestamps):
+            return self.timestamps[index]
+        return index / self.fps
+
+    def read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop and self.index > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            self.index = 0
+            self.start_wall = None
+            ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+
+        if self.speed == "native":
+            now = time.perf_counter()
+            if self.start_wall is None:
+                self.start_wall = now - self._frame_time(self.index)
+            wait = self.start_wall + self._frame_time(self.index) - now
+            if wait > 0:
+                time.sleep(wait)
+        self.frame_time = self._frame_time(self.index)
+        self.index += 1
+        return True, frame
+
+    def set(self, prop, value):
+        # camera settings don't apply to a recording
+        return False
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self.cap.release()
+
+
+class RecordingSource:
+    """
+    Wraps another source and writes every frame it reads to `path`, plus the
+    capture time of each frame (seconds from the first one) next to it, so the
+    session can be replayed at its real pace later.
+    """
+
+    def __init__(self, source, path, fourcc="MJPG"):
+        self.source = source
+        self.path = path
+        self.fourcc = fourcc
+        self.writer = None
+        self.ts_file = None
+        self.t0 = None
+
+    def isOpened(self):
+        return self.source.isOpened()
+
+    def read(self):
+        ret, frame = self.source.read()
+        if not ret:
+            return ret, frame
+        now = time.perf_counter()
+        if self.writer is None:
+            fps = self.source.get(cv2.CAP_PROP_FPS) or 30.0
+            height, width = frame.shape[:2]
+            self.writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*self.fourcc), fps, (width, height))
+            self.ts_file = open(timestamps_path(self.path), "w")
+            self.t0 = now
+            print(f"recording to {self.path}")
+        self.writer.write(frame)
+        self.ts_file.write(f"{now - self.t0:.6f}\n")
+        return ret, frame
+
+    def set(self, prop, value):
+        return self.source.set(prop, value)
+
+    def get(self, prop):
+        return self.source.get(prop)
+
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.ts_file.close()
+        self.source.release()
+
+
+def configure_capture(cap, width, height, fps=None, fourcc=None):
+    """
+    Ask a camera for a resolution, frame rate and pixel format, and return the
+    (width, height, fps) it actually gives. fourcc="MJPG" lets most USB webcams
+    go well past 30 fps, since uncompressed YUYV is limited by USB bandwidth.
+    The fourcc has to be set before the size for some backends (V4L2).
+    Recordings ignore all of it.
+    """
+    if fourcc:
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    if fps:
+        cap.set(cv2.CAP_PROP_FPS, fps)
+    return (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            cap.get(cv2.CAP_PROP_FPS))
+
+
+def is_replay(cap):
+    """True if cap plays a recording: a failed read() then means it ended, where a camera may just have hiccuped"""
+    while isinstance(cap, RecordingSource):
+        cap = cap.source
+    return isinstance(cap, ReplaySource)
+
+
+def open_source(source, record_to=None, speed="native", loop=False, api=None):
+    """
+    source: camera index (int) or path to a recording.
+    record_to: optional path (.avi) to record everything that's read.
+    speed / loop: replay options, see ReplaySource.
+    api: cv2 capture backend for cameras (e.g. cv2.CAP_AVFOUNDATION).
+    """
+    if isinstance(source, int):
+        cap = cv2.VideoCapture(source) if api is None else cv2.VideoCapture(source, api)
+    else:
+        cap = ReplaySource(source, speed=speed, loop=loop)
+    if record_to:
+        cap = RecordingSource(cap, record_to)
+    return cap
@@ -0,0 +1,272 @@
+import cv2
+import numpy as np
+from collections import namedtuple
+
+from color_mask import ColorMask
+
+# COLOR DETECTION
+BLUE_LOWER = np.array([90, 50, 50])
+BLUE_UPPER = np.array([130, 255, 255])
+
+MIN_SATURATION = 80
+MIN_VALUE = 60
+MAX_VALUE = 255
+
+# status change of a GoalDetector: status is "GOAL", "MISS" or "WAITING", t the time it happened
+# at (frame time, or when the ball crossed the top line), position the ball center or the
+# crossing point (pixels) that caused it (None for WAITING)
+GoalEvent = namedtuple("GoalEvent", ["status", "t", "position"])
+
+STATUS_COLORS = {"WAITING": (255, 255, 0), "GOAL": (0, 255, 0), "MISS": (0, 0, 255)}
+
+
+def get_color_name(hue):
+    """Convert HSV hue value to color name"""
+    if hue < 11:
+        return "RED"
+    elif hue < 25:
+        return "ORANGE"
+    elif hue < 35:
+        return "YELLOW"
+    elif hue < 85:
+        return "GREEN"
+    elif hue < 130:
+        return "BLUE"
+    elif hue < 170:
+        return "PURPLE"
+    else:
+        return "RED"
+
+
+def get_circle_color(ball_color):
+    """BGR color to draw a ball of this color name with"""
+    return {"RED": (0, 0, 255), "ORANGE": (0, 165, 255), "YELLOW": (0, 255, 255),
+            "GREEN": (0, 255, 0), "PURPLE": (255, 0, 255)}.get(ball_color, (255, 255, 255))
+
+
+class BallTrack:
+    """
+    The ball's last detection, to find where a fast shot crossed the top line
+    between two frames: the segment between consecutive detections is
+    interpolated at top_y, giving the crossing x and time. Detections more
+    than max_gap seconds apart aren't joined.
+    """
+
+    def __init__(self, max_gap=0.25):
+        self.max_gap = max_gap
+        self.last = None  # (center, t) of the previous detection
+
+    def update(self, center, t, top_y):
+        """Add a detection; returns (x, y, t) where the ball went down through top_y since the last one, or None"""
+        previous, self.last = self.last, (center, t)
+        if previous is None or t - previous[1] > self.max_gap:
+            return None
+        (x0, y0), t0 = previous
+        x1, y1 = center
+        if not y0 <= top_y < y1:
+            return None
+        k = (top_y - y0) / (y1 - y0)
+        return x0 + k * (x1 - x0), top_y, t0 + k * (t - t0)
+
+
+class GoalDetector:
+    """
+    Ball detection and the goal / miss zone state machine of the goal camera,
+    without any capture, GUI or MQTT. Feed it frames with process(frame, t);
+    it returns the status changes (GoalEvent) that frame caused.
+
+    The zones are split by three lines: a top line at top_percent of the
+    height, and left / right lines at left_percent / right_percent of the
+    width below it. A ball below the top line between the side lines locks
+    GOAL for goal_duration seconds, outside them MISS for miss_duration.
+    While locked nothing else is checked. Time only comes from t, so a
+    recording replays the same at any speed, and every instance has its own
+    state and buffers, so several can run side by side.
+
+    A ball seen above the top line and then below it in the next detection
+    is judged by where its path crossed the line (BallTrack), not where it
+    landed, so a fast shot that enters between the posts and is next seen
+    past one still counts as a GOAL. A ball first seen below the line is
+    judged by its position.
+
+    With a motion_gate (motion_gate.MotionGate) the ball pipeline only runs
+    on frames where something changed below half the top line's height, so
+    it also covers the band just above the line (the lower half of the area
+    above it) where the track sees shots coming in. The others are counted
+    in `skipped` and leave ball = None.
+    """
+
+    def __init__(self, top_percent=15, left_percent=25, right_percent=75, min_area=100,
+                 goal_duration=5, miss_duration=3, kernel=None, iterations=2, motion_gate=None,
+                 max_gap=0.25):
+        self.top_percent = top_percent       # Top horizontal line
+        self.left_percent = left_percent     # Left vertical line
+        self.right_percent = right_percent   # Right vertical line
+        self.min_area = min_area
+        self.goal_duration = goal_duration
+        self.miss_duration = miss_duration
+        self.motion_gate = motion_gate
+        self.track = BallTrack(max_gap)
+
+        # Saturated colors minus blue, then erode/dilate x2 to remove noise
+        self.ball_mask = ColorMask(include=[(np.array([0, MIN_SATURATION, MIN_VALUE]), np.array([180, 255, MAX_VALUE]))],
+                                   exclude=[(BLUE_LOWER, BLUE_UPPER)],
+                                   kernel=kernel if kernel is not None else np.ones((5, 5), np.uint8),
+                                   iterations=iterations)
+
+        # Goal tracking - LOCKED once triggered
+        self.status = "WAITING"
+        self.locked_until = None
+
+        # last frame's detection, for drawing / calibration views
+        self.hsv = None
+        self.mask = None
+        self.ball = None  # (center, radius, color name) of the ball, None if not detected
+        self.frames = 0
+        self.skipped = 0  # frames the motion gate kept from the ball pipeline
+
+    def get_lines(self, height, width):
+        """Pixel positions of the three lines"""
+        top_y = int(height * self.top_percent / 100)
+        left_x = int(width * self.left_percent / 100)
+        right_x = int(width * self.right_percent / 100)
+        return top_y, left_x, right_x
+
+    def reset(self, t):
+        """Reset goal/miss status; returns the WAITING event (or none if already waiting)"""
+        was_locked = self.status != "WAITING"
+        self.status = "WAITING"
+        self.locked_until = None
+        return [GoalEvent("WAITING", t, None)] if was_locked else []
+
+    def process(self, frame, t):
+        """Detect the ball in one BGR frame taken at time t (seconds) and update the zones. Returns a list of GoalEvents."""
+        self.frames += 1
+        events = []
+
+        # Unlock after duration expires
+        if self.locked_until is not None and t >= self.locked_until:
+            events += self.reset(t)
+
+        height, width = frame.shape[:2]
+        lines = self.get_lines(height, width)
+        # Nothing moved below half the top line's height: no new ball there, skip the HSV / mask / contour work
+        if self.motion_gate is not None and not self.motion_gate.changed(frame, lines[0] // 2):
+            self.skipped += 1
+            self.ball = None
+            return events
+
+        self.ball = self.detect_ball(frame)
+        if self.ball is not None:
+            crossing = self.track.update(self.ball[0], t, lines[0])
+            events += self.check_ball_zone(self.ball[0], t, *lines, crossing=crossing)
+        return events
+
+    def detect_ball(self, frame):
+        """Largest round, saturated, non-blue blob as (center, radius, color name), or None"""
+        # Convert BGR to HSV
+        self.hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+
+        # Colored objects (high saturation) that are not blue, with noise removed
+        self.mask = self.ball_mask.apply(self.hsv)
+
+        # Find contours
+        contours, _ = cv2.findContours(self.mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+
+        largest_contour = max(contours, key=cv2.contourArea)
+        area = cv2.contourArea(largest_contour)
+        if area <= self.min_area:
+            return None
+
+        (x, y), radius = cv2.minEnclosingCircle(largest_contour)
+        center = (int(x), int(y))
+        radius = int(radius)
+
+        perimeter = cv2.arcLength(largest_contour, True)
+        if perimeter > 0:
+            circularity = 4 * np.pi * area / (perimeter * perimeter)
+        else:
+            circularity = 0
+        if circularity <= 0.6 or radius <= 3:
+            return None
+
+        cx, cy = center
+        if 0 <= cy < self.hsv.shape[0] and 0 <= cx < self.hsv.shape[1]:
+            ball_color = get_color_name(self.hsv[cy, cx][0])
+        else:
+            ball_color = "UNKNOWN"
+        return center, radius, ball_color
+
+    def check_ball_zone(self, center, t, top_y, left_x, right_x, crossing=None):
+        """Check which zone the ball is in - ONLY if not already locked.
+        crossing: (x, y, t) where its path crossed the top line since the last detection, if it did"""
+        # If already locked into a goal or miss, don't check anymore
+        if self.status != "WAITING":
+            return []
+
+        if crossing is not None:
+            # judge by where it came through the top line, at the time it did
+            x, y, t = crossing
+            center = (int(round(x)), int(y))
+        else:
+            x, y = center
+            # Only check if ball is below the top line
+            if y <= top_y:
+                return []
+        # Check if in middle section (GOAL), otherwise outer sections (MISS)
+        if left_x <= x <= right_x:
+            self.status = "GOAL"
+            self.locked_until = t + self.goal_duration
+        else:
+            self.status = "MISS"
+            self.locked_until = t + self.miss_duration
+        return [GoalEvent(self.status, t, center)]
+
+    def remaining(self, t):
+        """Seconds left on the current GOAL / MISS lock (0 when waiting)"""
+        if self.locked_until is None:
+            return 0.0
+        return max(0.0, self.locked_until - t)
+
+    def draw(self, frame, t):
+        """Lines, zone labels, the detected ball and the status banner on frame"""
+        height, width = frame.shape[:2]
+        top_y, left_x, right_x = self.get_lines(height, width)
+
+        if self.ball is not None:
+            center, radius, ball_color = self.ball
+            circle_color = get_circle_color(ball_color)
+            # Draw ball
+            cv2.circle(frame, center, radius, circle_color, 2)
+            cv2.circle(frame, center, 5, circle_color, -1)
+            # Draw ball info
+            cv2.putText(frame, f"{ball_color} Ball", (center[0] - 50, center[1] - radius - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, circle_color, 2)
+
+        # Draw lines
+        cv2.line(frame, (0, top_y), (width, top_y), (0, 0, 0), 3) # top
+        cv2.line(frame, (left_x, top_y), (left_x, height), (0, 0, 0), 3) # left
+        cv2.line(frame, (right_x, top_y), (right_x, height), (0, 0, 0), 3) # right
+
+        # Label zones
+        cv2.putText(frame, "GOAL", (int((left_x + right_x)/2) - 30, height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        cv2.putText(frame, "MISS", (10, height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        cv2.putText(frame, "MISS", (right_x + 10, height - 20),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+
+        # Display status message
+        status_text = self.status if self.status == "WAITING" else f"{self.status}! ({self.remaining(t):.1f}s)"
+        cv2.rectangle(frame, (10, 10), (width - 10, 80), (0, 0, 0), -1)
+        cv2.putText(frame, status_text, (20, 50),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.2, STATUS_COLORS[self.status], 3)
+
+        # Display line positions
+        cv2.putText(frame, f"Top: {self.top_percent}% | L: {self.left_percent}% | R: {self.right_percent}%",
+                    (10, height - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+        if self.motion_gate is not None and self.frames > 0:
+            cv2.putText(frame, f"gate skipped {self.skipped / self.frames:.0%}",
+                        (10, height - 70), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
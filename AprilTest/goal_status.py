@@ -0,0 +1,72 @@
+import time
+
+# Goal status message (ball/goal_status), text so it stays readable in any MQTT client:
+#   "STATUS|stamp|seq|sent_stamp"
+# STATUS is GOAL, MISS, WAITING or SHUTDOWN. stamp is the unix time the status changed
+# (for GOAL / MISS when the ball crossed the line), seq counts status changes, so a
+# heartbeat repeats the seq of the change it repeats. sent_stamp is when this copy went out.
+# The first field is still the status, so "status|time" consumers keep working.
+
+
+def encode_status(status, stamp, seq, sent_stamp):
+    return f"{status}|{stamp:.3f}|{seq}|{sent_stamp:.3f}"
+
+
+def decode_status(payload):
+    """payload (bytes or str) -> dict(status, stamp, seq, sent_stamp); seq / sent_stamp are None for old "status|time" messages"""
+    if isinstance(payload, bytes):
+        payload = payload.decode()
+    fields = payload.split("|")
+    data = {"status": fields[0], "stamp": None, "seq": None, "sent_stamp": None}
+    if len(fields) > 1:
+        data["stamp"] = float(fields[1])
+    if len(fields) > 3:
+        data["seq"] = int(fields[2])
+        data["sent_stamp"] = float(fields[3])
+    return data
+
+
+class GoalStatusPublisher:
+    """
+    Publishes the goal camera's status when it changes, right away, as a
+    retained message so a consumer that (re)subscribes gets the current
+    status from the broker immediately. In between it repeats the current
+    status every `heartbeat` seconds (same seq) so consumers can tell the
+    camera is alive. Call change() on every transition and tick() every loop.
+    """
+
+    def __init__(self, client, topic, heartbeat=5.0, qos=1, retain=True):
+        self.client = client
+        self.topic = topic
+        self.heartbeat = heartbeat
+        self.qos = qos
+        self.retain = retain
+
+        self.status = None
+        self.stamp = None
+        self.seq = 0
+        self.last_sent_time = 0.0
+
+    def change(self, status, stamp=None):
+        """Publish a new status now. stamp: when it happened (unix seconds), defaults to now.
+        Returns the paho MessageInfo (None if publishing failed)."""
+        self.seq += 1
+        self.status = status
+        self.stamp = time.time() if stamp is None else stamp
+        info = self._send()
+        print(f"MQTT: {status} (seq {self.seq})")
+        return info
+
+    def tick(self):
+        """Heartbeat: resend the current status if nothing went out for `heartbeat` seconds"""
+        if self.status is not None and time.monotonic() - self.last_sent_time >= self.heartbeat:
+            self._send()
+
+    def _send(self):
+        payload = encode_status(self.status, self.stamp, self.seq, time.time())
+        self.last_sent_time = time.monotonic()
+        try:
+            return self.client.publish(self.topic, payload, qos=self.qos, retain=self.retain)
+        except Exception as e:
+            print(f"MQTT Error: {e}")
+            return None
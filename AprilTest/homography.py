@@ -0,0 +1,84 @@
+import os
+import cv2
+import numpy as np
+
+
+class HomographyManager:
+    """
+    Keeps the image -> field homography up to date instead of computing it once.
+
+    Every frame that sees all four control tags, the tags are pushed through
+    the current H and compared with where they should land on the field. That
+    reprojection error (cm) is the drift metric. H is only re-estimated once
+    the drift stays above `drift_threshold` for `confirm_frames` frames in a
+    row (camera got bumped), not on every bit of detection noise.
+
+    The last good H is saved to `path` and loaded on startup, so poses are
+    available straight away even if the control tags are covered.
+    """
+
+    def __init__(self, target_points, path="homography.npy", drift_threshold=2.0, confirm_frames=3):
+        self.target_points = np.asarray(target_points, dtype=np.float32)
+        self.path = path
+        self.drift_threshold = drift_threshold
+        self.confirm_frames = confirm_frames
+
+        self.H = None
+        self.drift = None          # last measured reprojection error (cm), None until measured
+        self.reestimates = 0
+        self._over_threshold = 0
+        self.load()
+
+    def load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                H = np.load(self.path)
+            except (OSError, ValueError) as e:
+                print(f"Couldn't load saved homography from {self.path}: {e}")
+                return
+            if H.shape == (3, 3):
+                self.H = H
+                print(f"Loaded saved homography from {self.path}")
+
+    def save(self):
+        if self.path:
+            np.save(self.path, self.H)
+
+    def reprojection_error(self, control_points, H=None):
+        H = self.H if H is None else H
+        projected = cv2.perspectiveTransform(control_points.reshape(-1, 1, 2).astype(np.float32), H)
+        return float(np.linalg.norm(projected.reshape(-1, 2) - self.target_points, axis=1).mean())
+
+    def update(self, control_points, control_tag_count):
+        """Feed this frame's control tags; returns the H to use (None if we don't have one yet)"""
+        if control_tag_count != len(self.target_points):
+            # can't measure drift without all four tags, keep using what we have
+            return self.H
+
+        if self.H is None:
+            self._estimate(control_points)
+            return self.H
+
+        self.drift = self.reprojection_error(control_points)
+        if self.drift > self.drift_threshold:
+            self._over_threshold += 1
+            if self._over_threshold >= self.confirm_frames:
+                print(f"Homography drift {self.drift:.1f} cm, re-estimating")
+                self._estimate(control_points)
+        else:
+            self._over_threshold = 0
+        return self.H
+
+    def _estimate(self, control_points):
+        print("Calculating Homography Matrix")
+        H, mask = cv2.findHomography(control_points, self.target_points, method=cv2.RANSAC)
+        # if H is None, there was a problem, keep the previous one
+        if H is None:
+            print("Homography calculation failed")
+            return
+        print("Homography Matrix calculated.")
+        self.H = H
+        self.drift = self.reprojection_error(control_points)
+        self.reestimates += 1
+        self._over_threshold = 0
+        self.save()
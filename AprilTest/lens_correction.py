@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+
+# save intrinsics from camera_calibration.py. image_size is (width, height) of the calibration frames.
+def save_intrinsics(path, camera_matrix, dist_coeffs, image_size, rms):
+    np.savez(path, camera_matrix=camera_matrix, dist_coeffs=dist_coeffs,
+             image_size=np.array(image_size), rms=rms)
+
+
+class LensUndistorter:
+    """
+    Removes the webcam's lens distortion using intrinsics saved by
+    camera_calibration.py, so points near the field edges land where the
+    homography expects them.
+
+    mode="frame":  raw frames are remapped with cv2.remap through
+                   initUndistortRectifyMap tables that are built once per frame
+                   size and reused, so each frame is a table lookup.
+    mode="points": frames are left alone and only the detected points are
+                   undistorted (cv2.undistortPoints), a few points instead of
+                   every pixel. Tag / ball detection still sees the distorted
+                   image, which is fine for the mild distortion of a webcam.
+
+    Both modes keep the original camera matrix as the output one, so the
+    pixel scale is the same as before and the two are interchangeable.
+    Intrinsics calibrated at another resolution (same aspect) are rescaled.
+    """
+
+    def __init__(self, path, mode="points"):
+        if mode not in ("frame", "points"):
+            raise ValueError(f"mode must be 'frame' or 'points', not {mode!r}")
+        data = np.load(path)
+        self.camera_matrix = data["camera_matrix"]
+        self.dist_coeffs = data["dist_coeffs"]
+        self.calib_size = tuple(int(v) for v in data["image_size"])
+        self.mode = mode
+
+        self.size = None      # (width, height) of the raw frames seen so far
+        self.K = None         # camera matrix for that size
+        self.map1 = None
+        self.map2 = None
+        self.out = None
+        print(f"lens correction ({mode}) from {path}, calibration rms {float(data['rms']):.2f} px")
+
+    def _set_size(self, size):
+        self.size = size
+        sx, sy = size[0] / self.calib_size[0], size[1] / self.calib_size[1]
+        self.K = self.camera_matrix.copy()
+        self.K[0] *= sx
+        self.K[1] *= sy
+        if self.mode == "frame":
+            # fixed-point maps make cv2.remap about twice as fast as float ones
+            self.map1, self.map2 = cv2.initUndistortRectifyMap(self.K, self.dist_coeffs, None, self.K, size, cv2.CV_16SC2)
+            self.out = None
+
+    def frame(self, raw_img):
+        """Undistorted raw frame in "frame" mode (a reused buffer), the frame itself in "points" mode"""
+        size = (raw_img.shape[1], raw_img.shape[0])
+        if size != self.size:
+            self._set_size(size)
+        if self.mode != "frame":
+            return raw_img
+        if self.out is None or self.out.shape != raw_img.shape:
+            self.out = np.empty_like(raw_img)
+        cv2.remap(raw_img, self.map1, self.map2, cv2.INTER_LINEAR, dst=self.out)
+        return self.out
+
+    def points(self, points, scale):
+        """(N, 2) points in pixels of the raw frame resized by `scale` -> undistorted, same units.
+        Only does anything in "points" mode, after frame() has seen a frame."""
+        if self.mode != "points" or self.K is None or len(points) == 0:
+            return points
+        raw = (np.asarray(points, dtype=np.float32) / scale).reshape(-1, 1, 2)
+        undistorted = cv2.undistortPoints(raw, self.K, self.dist_coeffs, P=self.K)
+        return undistorted.reshape(-1, 2) * scale
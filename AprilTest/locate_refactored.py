@@ -3,8 +3,20 @@ import numpy as np
 import pyapriltags as apriltag
 import time
 import math
-import json
 import paho.mqtt.client as mqtt
+from frame_source import open_source, is_replay
+from frame_pipeline import LatestSlot, StageStats, CaptureThread, PublishThread, report_stats, wall_time
+from tag_tracking import make_tag_tracker
+from ball_detection import build_ball_mask, detect_ball_cc, detect_balls_cc
+from tag_registry import TagRegistry, DEFAULT_REGISTRY
+from homography import HomographyManager
+from pose_tracker import PoseTracker, PredictionPublisher
+from debug_view import DebugView
+from pose_message import PosePublisher, FieldPublisher
+from parallel_detect import ParallelDetector
+from detector_tuning import AutoTuner, configure_detector
+from lens_correction import LensUndistorter
+from field_roi import FieldRoi
 
 
 # resize image and generate diff color versions for processing
@@ -22,52 +34,46 @@ def process_image(raw_img, scale_factor=0.2):
     return color_img, grayscale_img, hsv_img
 
 
-# detect the apriltag positions in the image
-def detect_apriltags(grayscale_img, detector, color_img, control_points, robot_points):
+# detect the apriltag positions in the image (pass color_img=None to skip drawing).
+# Tag ids are looked up in the TagRegistry: control tags fill control_points[corner],
+# robot tags fill robot_points[name]. Returns (control_tag_count, names of robots found).
+def detect_apriltags(grayscale_img, detector, color_img, control_points, robot_points, registry=DEFAULT_REGISTRY):
 
     tags = detector.detect(grayscale_img)
     control_tag_count = 0
-    robot_found = False
+    robots_found = []
     
     for tag in tags:
-        Cx, Cy = int(tag.center[0]), int(tag.center[1])
-        cv2.circle(color_img, (Cx, Cy), 10, (0, 0, 255), -1) # Draw center
-
-        match tag.tag_id:
-            case 0: control_points[0] = tag.center; control_tag_count += 1
-            case 1: control_points[1] = tag.center; control_tag_count += 1
-            case 2: control_points[2] = tag.center; control_tag_count += 1
-            case 3: control_points[3] = tag.center; control_tag_count += 1
-            case 4: 
-                # Robot tag: Find center and orientation point
-                robot_points["center"] = tag.center
-                robot_points["top"] = (tag.corners[0] + tag.corners[1]) / 2
-                robot_found = True
+        if color_img is not None:
+            Cx, Cy = int(tag.center[0]), int(tag.center[1])
+            cv2.circle(color_img, (Cx, Cy), 10, (0, 0, 255), -1) # Draw center
+
+        if tag.tag_id in registry.control_index:
+            control_points[registry.control_index[tag.tag_id]] = tag.center
+            control_tag_count += 1
+        elif tag.tag_id in registry.robots:
+            # Robot tag: Find center and orientation point
+            name = registry.robots[tag.tag_id]
+            robot_points[name]["center"] = tag.center
+            robot_points[name]["top"] = (tag.corners[0] + tag.corners[1]) / 2
+            robots_found.append(name)
     
-    return control_tag_count, robot_found
+    return control_tag_count, robots_found
 
 
 # detect ball position in image by a color threshold
-def detect_ball(hsv_img, color_img, lower_thresh, upper_thresh, kernel):
-    # Blue exclusion range  filter this out
-    BLUE_LOWER = np.array([90, 50, 50])      # Covers cyan to deep blue
-    BLUE_UPPER = np.array([130, 255, 255])
-
+# (color_img=None skips drawing, the mask is only shown if a DebugView is passed)
+# (min_radius / max_radius are in pixels at SCALE_FACTOR, tune them with it)
+def detect_ball(hsv_img, color_img, lower_thresh, upper_thresh, kernel, view=None, min_radius=1, max_radius=5,
+                roi_mask=None):
     ball_point = np.array([-1000, -1000], dtype=np.float32)
     ball_found = False
     largest_area = 0
-    min_radius, max_radius = 1, 5 # Tune these based on image scale
-
-    saturation_mask = cv2.inRange(hsv_img, lower_thresh, upper_thresh)
-    # Create mask for blue
-    blue_mask = cv2.inRange(hsv_img, BLUE_LOWER, BLUE_UPPER)
-    blue_mask = cv2.bitwise_not(blue_mask)  # Invert to exclude blue
-    # Combine masks: keep only saturated colors that are NOT blue
-    mask = cv2.bitwise_and(saturation_mask, blue_mask)
-    mask = cv2.erode(mask, kernel, iterations=1)
-    mask = cv2.dilate(mask, kernel, iterations=1)
-
-    cv2.imshow("mask", mask)
+
+    mask = build_ball_mask(hsv_img, lower_thresh, upper_thresh, kernel, roi_mask)
+
+    if view is not None:
+        view.show("mask", mask)
     
     contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
@@ -94,40 +100,388 @@ def detect_ball(hsv_img, color_img, lower_thresh, upper_thresh, kernel):
                     ball_found = True
                     
                     # Draw detected contour (using the last valid radius)
-                    cv2.circle(color_img, (cX, cY), int(radius), (0, 255, 0), 2)
-                    print(circularity)
+                    if color_img is not None:
+                        cv2.circle(color_img, (cX, cY), int(radius), (0, 255, 0), 2)
+                        print(circularity)
                     
     return ball_point, ball_found
 
 
-# apply homography to calculate robot and ball coordinate positions
-def calculate_pose(H, robot_points, ball_point):
+# apply homography to calculate robot and ball coordinate positions.
+# Every robot (center + orientation point) and ball of the frame goes through one
+# batched perspectiveTransform call. Returns ({name: (x, y, theta)}, (N, 2) ball coords).
+def calculate_poses(H, robot_points, ball_points):
     
-    # 1. Prepare input array
-    input_points = np.array([
-        robot_points["center"],     # Index 0: Robot Position (P_A)
-        robot_points["top"],        # Index 1: Robot Direction (P_B)
-        ball_point                  # Index 2: Ball Position
-    ], dtype=np.float32).reshape(-1, 1, 2)
+    # 1. Prepare input array: [center_0, top_0, center_1, top_1, ..., ball_0, ball_1, ...]
+    names = list(robot_points)
+    n_robots = len(names)
+    input_points = np.empty((2 * n_robots + len(ball_points), 1, 2), dtype=np.float32)
+    for i, name in enumerate(names):
+        input_points[2 * i, 0] = robot_points[name]["center"]     # Robot Position (P_A)
+        input_points[2 * i + 1, 0] = robot_points[name]["top"]    # Robot Direction (P_B)
+    input_points[2 * n_robots:, 0] = ball_points
+    if len(input_points) == 0:
+        return {}, np.empty((0, 2), dtype=np.float32)
 
     # 2. Apply Homography
-    target_points_transformed = cv2.perspectiveTransform(input_points, H)
+    target_points_transformed = cv2.perspectiveTransform(input_points, H).reshape(-1, 2)
 
     # 3. Extract points
-    robot_x, robot_y = target_points_transformed[0][0]
-    robot_tag_top_x, robot_tag_top_y = target_points_transformed[1][0]
-    ball_x, ball_y = target_points_transformed[2][0]
+    robot_xy = target_points_transformed[0:2 * n_robots:2]
+    robot_tag_top = target_points_transformed[1:2 * n_robots:2]
+    ball_xy = target_points_transformed[2 * n_robots:]
 
     # 4. Calculate Orientation
-    delta_X = robot_tag_top_x - robot_x
-    delta_Y = robot_tag_top_y - robot_y
-
-    orientation_radians = np.arctan2(delta_Y, delta_X)
+    delta = robot_tag_top - robot_xy
+    orientation_radians = np.arctan2(delta[:, 1], delta[:, 0])
     orientation_normalized = (orientation_radians + 2*math.pi) % (2*math.pi)
-    orientation_degrees = np.degrees(orientation_radians)
-    
-    
-    return robot_x, robot_y, orientation_normalized, ball_x, ball_y
+
+    robots = {name: (float(robot_xy[i, 0]), float(robot_xy[i, 1]), float(orientation_normalized[i]))
+              for i, name in enumerate(names)}
+    return robots, ball_xy
+
+# all balls in the frame as an (N, 2) array, largest first. More than one ball needs the
+# connected-components engine, the single-ball detectors return at most one.
+def detect_balls(hsv_img, color_img, ball_detector, lower_thresh, upper_thresh, kernel, max_balls=1, view=None,
+                 min_radius=1, max_radius=5, roi=None):
+    # roi = (x0, y0, mask) from FieldRoi.region: only the field's bounding box is thresholded
+    # and blobs outside the field polygon are dropped. Points come back in full-frame pixels.
+    x0 = y0 = 0
+    roi_mask = None
+    if roi is not None:
+        x0, y0, roi_mask = roi
+        if roi_mask.size == 0:
+            return np.empty((0, 2), dtype=np.float32) # field is off-screen
+        height, width = roi_mask.shape
+        hsv_img = hsv_img[y0:y0 + height, x0:x0 + width]
+        if color_img is not None:
+            color_img = color_img[y0:y0 + height, x0:x0 + width] # a view, so overlays land in the full frame
+
+    if max_balls > 1:
+        ball_points = detect_balls_cc(hsv_img, color_img, lower_thresh, upper_thresh, kernel, max_balls,
+                                      min_radius, max_radius, view=view, roi_mask=roi_mask)
+    else:
+        ball_point, ball_found = ball_detector(hsv_img, color_img, lower_thresh, upper_thresh, kernel, view=view,
+                                               min_radius=min_radius, max_radius=max_radius, roi_mask=roi_mask)
+        ball_points = ball_point.reshape(1, 2) if ball_found else np.empty((0, 2), dtype=np.float32)
+    if len(ball_points) and (x0 or y0):
+        ball_points = ball_points + np.array([x0, y0], dtype=np.float32)
+    return ball_points
+
+
+class Locator:
+    """
+    Per-run detection state (tag points, homography) and the per-frame chain
+    process_image -> detect_apriltags -> detect_balls -> calculate_poses.
+    """
+
+    def __init__(self, detector, homography, lower_thresh, upper_thresh, kernel, tag_tracker=None,
+                 ball_detector=detect_ball, view=None, registry=DEFAULT_REGISTRY, max_balls=1, tuner=None,
+                 undistorter=None, field_roi=None):
+        self.detector = detector
+        self.tag_tracker = tag_tracker # optional RoiTagTracker / FlowTagTracker, used instead of detect_apriltags
+        self.ball_detector = ball_detector # detect_ball or detect_ball_cc
+        self.homography = homography # HomographyManager, owns H and its drift check
+        self.lower_thresh = lower_thresh
+        self.upper_thresh = upper_thresh
+        self.kernel = kernel
+        self.view = view if view is not None else DebugView("headless")
+        self.registry = registry # TagRegistry: which tag is a field corner / which robot
+        self.max_balls = max_balls
+        self.tuner = tuner # optional AutoTuner, picks scale / quad_decimate / nthreads for the frame budget
+        self.scale = SCALE_FACTOR
+        self.undistorter = undistorter # optional LensUndistorter, removes lens distortion from frames or points
+        self.field_roi = field_roi # optional FieldRoi, ball search only inside the field polygon
+
+        # Initialize control and robot state arrays (pixels at self.scale)
+        self.control_points = np.zeros((4, 2), dtype=np.float32)
+        self.robot_points = registry.new_robot_points()
+        if tuner is not None:
+            self.apply_tuning()
+
+    def apply_tuning(self):
+        """Switch to the tuner's current settings"""
+        scale, quad_decimate, nthreads = self.tuner.settings()
+        configure_detector(self.detector, quad_decimate, nthreads)
+        if scale != self.scale:
+            # everything cached is in pixels of the old scale
+            self.scale = scale
+            self.control_points[:] = 0
+            self.robot_points = self.registry.new_robot_points()
+            if self.tag_tracker is not None:
+                self.tag_tracker.reset()
+
+    def locate(self, raw_color_img):
+        """Returns the pose dict for one frame, or None if the field isn't calibrated yet"""
+        t_start = time.perf_counter()
+        if self.undistorter is not None:
+            raw_color_img = self.undistorter.frame(raw_color_img)
+        color_img, grayscale_img, hsv_img = process_image(raw_color_img, scale_factor=self.scale)
+
+        # overlays are only drawn on the frames the debug view wants (never when headless)
+        draw = self.view.should_draw()
+        overlay_img = color_img if draw else None
+        overlay_view = self.view if draw else None
+        
+        # detect apriltags
+        if self.tag_tracker is not None:
+            control_tag_count, robots_found = self.tag_tracker.detect(grayscale_img, overlay_img, self.control_points, self.robot_points)
+        else:
+            control_tag_count, robots_found = detect_apriltags(grayscale_img, self.detector, overlay_img, self.control_points,
+                                                               self.robot_points, self.registry)
+        
+        # detect balls, inside the field (last frame's H) if there is a field ROI
+        to_reference = SCALE_FACTOR / self.scale # ball size limits are tuned at SCALE_FACTOR
+        roi = None
+        if self.field_roi is not None:
+            roi = self.field_roi.region(self.homography.H, 1 / to_reference, hsv_img.shape)
+            if draw:
+                self.field_roi.draw(color_img)
+        ball_points = detect_balls(hsv_img, overlay_img, self.ball_detector, self.lower_thresh, self.upper_thresh, self.kernel,
+                                   self.max_balls, overlay_view, 1 / to_reference, 5 / to_reference, roi)
+
+        # show image with all the overlays of detected tags + ball
+        if draw:
+            self.view.show("Detection Overlay", color_img)
+
+        pose = self.pose_from_detections(control_tag_count, robots_found, ball_points, self.scale)
+
+        if self.tuner is not None:
+            # fraction of what we look for that was found this frame: control tags, robots, balls
+            expected = 4 + len(self.registry.robot_names) + self.max_balls
+            score = (control_tag_count + len(robots_found) + min(len(ball_points), self.max_balls)) / expected
+            if self.tuner.record(time.perf_counter() - t_start, score):
+                self.apply_tuning()
+        return pose
+
+    def pose_from_detections(self, control_tag_count, robots_found, ball_points, scale=None):
+        """Homography + pose from one frame's detections (self.control_points / self.robot_points already filled).
+        H works in undistorted pixels at SCALE_FACTOR, points found at another scale are converted first."""
+        control_points, robot_points = self.control_points, self.robot_points
+        scale = SCALE_FACTOR if scale is None else scale
+        if scale != SCALE_FACTOR or self.undistorter is not None:
+            # every point of the frame in one array: control tags, robot center/top pairs, balls
+            names = list(robot_points)
+            robot_array = np.array([[robot_points[n]["center"], robot_points[n]["top"]] for n in names],
+                                   dtype=np.float32).reshape(-1, 2)
+            points = np.concatenate([control_points, robot_array, np.asarray(ball_points, dtype=np.float32).reshape(-1, 2)])
+            if self.undistorter is not None:
+                points = self.undistorter.points(points, scale)
+            points = points * (SCALE_FACTOR / scale)
+            control_points = points[:4]
+            robot_points = {name: {"center": points[4 + 2 * i], "top": points[5 + 2 * i]} for i, name in enumerate(names)}
+            ball_points = points[4 + 2 * len(names):]
+
+        # check the control tags against H, re-estimating only if the camera moved
+        H = self.homography.update(control_points, control_tag_count)
+        if H is None:
+            print(f"Calibration tags missing: Found only {control_tag_count} out of 4.")
+            return None
+
+        # calculate all robot and ball coords with one homography transform
+        robots, balls = calculate_poses(H, robot_points, ball_points)
+        robot_x, robot_y, robot_theta = robots.get(self.registry.primary, (0.0, 0.0, 0.0))
+        ball_found = len(balls) > 0
+        ball_x, ball_y = balls[0] if ball_found else (-1000.0, -1000.0)
+        drift = self.homography.drift
+
+        # robot_* / ball_* are the primary robot and the largest ball (robot/position message),
+        # robots / balls hold everything on the field (field/poses message)
+        return {
+            'robot_found':self.registry.primary in robots_found,
+            'robot_x':float(robot_x),
+            'robot_y':float(robot_y),
+            'robot_theta':float(robot_theta),
+            'ball_found':ball_found,
+            'ball_x':float(ball_x),
+            'ball_y':float(ball_y),
+            'h_drift':float(drift) if drift is not None else -1.0, # control tag reprojection error (cm)
+            'robots':{name: {'found':name in robots_found, 'x':x, 'y':y, 'theta':theta}
+                      for name, (x, y, theta) in robots.items()},
+            'balls':balls.tolist()
+            }
+
+
+# tag a pose with the camera frame it came from (seq + wall-clock capture time),
+# these go out in the pose message so consumers can tell how old it is
+def stamp_pose(pose, seq, t_capture):
+    pose['frame_seq'] = seq
+    pose['capture_stamp'] = wall_time(t_capture)
+
+
+# original one-frame-at-a-time loop: capture, detect, publish, sleep
+def run_serial(cap, locator, pose_publisher, pose_tracker=None):
+    seq = 0
+    while True:
+        # raw_color_img = cv2.imread('test2.jpg')
+        ret, raw_color_img = cap.read()
+        if not ret:
+            if is_replay(cap):
+                print("end of recording")
+                break
+            print("couldn't capture frame, continuing")
+            time.sleep(0.1)
+            continue
+
+        t_capture = time.perf_counter()
+        seq += 1
+        pose = locator.locate(raw_color_img)
+        if pose is None:
+            time.sleep(0.1)
+            continue
+        stamp_pose(pose, seq, t_capture)
+
+        if pose_tracker is not None:
+            pose_tracker.update(pose, t_capture)
+            pose = pose_tracker.predict(time.perf_counter())
+        pose_publisher.publish(pose)
+
+        time.sleep(FRAME_DELAY)
+        locator.view.poll_key()
+
+
+# pipelined loop: a capture thread and a publish thread around the detection stage.
+# Each hand-off keeps only the newest item, so we never work on a stale frame.
+# With a pose tracker the publish thread instead sends predicted poses at PREDICT_HZ.
+def run_pipelined(cap, locator, pose_publisher, pose_tracker=None):
+    frame_slot = LatestSlot()
+    result_slot = LatestSlot()
+    capture = CaptureThread(cap, frame_slot, live=not is_replay(cap))
+    if pose_tracker is not None:
+        publisher = PredictionPublisher(pose_tracker, pose_publisher.publish,
+                                        PREDICT_HZ, StageStats("predict"))
+    else:
+        publisher = PublishThread(result_slot, pose_publisher.publish)
+    detect_stats = StageStats("detect")
+
+    capture.start()
+    publisher.start()
+    last_report = time.perf_counter()
+    try:
+        while True:
+            item = frame_slot.get(timeout=1.0)
+            if item is None:
+                if frame_slot.closed: # recording ended
+                    break
+                continue
+            seq, t_capture, raw_color_img = item
+
+            # detection runs here on the main thread since imshow/waitKey need it
+            t0 = time.perf_counter()
+            pose = locator.locate(raw_color_img)
+            t1 = time.perf_counter()
+            detect_stats.record(t1 - t0, t1 - t_capture)
+
+            if pose is not None:
+                stamp_pose(pose, seq, t_capture)
+                if pose_tracker is not None:
+                    pose_tracker.update(pose, t_capture)
+                else:
+                    result_slot.put((seq, t_capture, pose))
+            locator.view.poll_key()
+
+            if t1 - last_report >= STATS_INTERVAL:
+                print("pipeline stats:")
+                report_stats([capture.stats, detect_stats, publisher.stats], frame_slot, result_slot)
+                print(f"  poses sent: {pose_publisher.sent}, unchanged and skipped: {pose_publisher.suppressed}")
+                tag_tracker = locator.tag_tracker
+                if tag_tracker is not None:
+                    print(f"  tag search: {tag_tracker.summary()}")
+                if locator.tuner is not None:
+                    print(f"  detector: {locator.tuner.summary()}, {locator.tuner.changes} changes")
+                last_report = t1
+    finally:
+        capture.stop()
+        if pose_tracker is not None:
+            publisher.stop()
+        frame_slot.close()
+        result_slot.close()
+        capture.join(timeout=1.0)
+        publisher.join(timeout=1.0)
+
+
+# parallel loop: tag decoding and ball segmentation of each frame run at the same time in
+# two worker processes (parallel_detect.py), frames are shared through shared memory.
+# The main thread only resizes frames, joins the results by seq and finishes the pose.
+def run_parallel(cap, locator, parallel, pose_publisher, pose_tracker=None):
+    frame_slot = LatestSlot()
+    result_slot = LatestSlot()
+    capture = CaptureThread(cap, frame_slot, live=not is_replay(cap))
+    if pose_tracker is not None:
+        publisher = PredictionPublisher(pose_tracker, pose_publisher.publish,
+                                        PREDICT_HZ, StageStats("predict"))
+    else:
+        publisher = PublishThread(result_slot, pose_publisher.publish)
+    detect_stats = StageStats("detect")
+    overlays = {} # seq -> resized frame, kept only for frames the debug view draws
+
+    capture.start()
+    publisher.start()
+    last_report = time.perf_counter()
+    try:
+        while True:
+            # keep the ring full: hand over the newest frame whenever a slot is free
+            if parallel.can_submit():
+                item = frame_slot.get(timeout=0.005)
+                if item is not None:
+                    seq, t_capture, raw_color_img = item
+                    if locator.undistorter is not None:
+                        raw_color_img = locator.undistorter.frame(raw_color_img)
+                    color_img = cv2.resize(raw_color_img, (0, 0), fx=SCALE_FACTOR, fy=SCALE_FACTOR, interpolation=cv2.INTER_AREA)
+                    if parallel.submit(seq, t_capture, color_img) and locator.view.should_draw():
+                        overlays[seq] = color_img
+
+            for seq, t_capture, tags, ball in parallel.collect(timeout=0.005):
+                t0 = time.perf_counter()
+                control_tag_count, control_points, robots_found, robots = tags
+                locator.control_points[:] = control_points
+                for name, (center, top) in robots.items():
+                    locator.robot_points[name]["center"] = center
+                    locator.robot_points[name]["top"] = top
+
+                color_img = overlays.pop(seq, None)
+                if color_img is not None:
+                    for center in control_points if control_tag_count else ():
+                        cv2.circle(color_img, (int(center[0]), int(center[1])), 10, (0, 0, 255), -1)
+                    for center, _ in robots.values():
+                        cv2.circle(color_img, (int(center[0]), int(center[1])), 10, (0, 0, 255), -1)
+                    for x, y in ball:
+                        cv2.circle(color_img, (int(x), int(y)), 4, (0, 255, 0), 2)
+                    locator.view.show("Detection Overlay", color_img)
+
+                pose = locator.pose_from_detections(control_tag_count, robots_found, ball)
+                t1 = time.perf_counter()
+                detect_stats.record(t1 - t0, t1 - t_capture) # busy = join + pose on this thread, the detection itself is in the workers
+                if pose is not None:
+                    stamp_pose(pose, seq, t_capture)
+                    if pose_tracker is not None:
+                        pose_tracker.update(pose, t_capture)
+                    else:
+                        result_slot.put((seq, t_capture, pose))
+            # overlays of frames that were dropped as stale never come back
+            for seq in [s for s in overlays if s < parallel.last_done]:
+                del overlays[seq]
+            locator.view.poll_key()
+            if frame_slot.drained() and not parallel.in_flight: # recording ended and every frame came back
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= STATS_INTERVAL:
+                print("pipeline stats:")
+                report_stats([capture.stats, detect_stats, publisher.stats], frame_slot, result_slot)
+                print(f"  poses sent: {pose_publisher.sent}, unchanged and skipped: {pose_publisher.suppressed}")
+                print(f"  parallel detect: {len(parallel.in_flight)} in flight, {parallel.dropped} ring full, {parallel.stale} out of order")
+                last_report = now
+    finally:
+        capture.stop()
+        if pose_tracker is not None:
+            publisher.stop()
+        frame_slot.close()
+        result_slot.close()
+        capture.join(timeout=1.0)
+        publisher.join(timeout=1.0)
+        parallel.close()
+
 
 # ------------------------- MAIN EXECUTION -----------------------------
 
@@ -143,104 +497,122 @@ target_points = np.array([
     [0, H]       # TL tag maps to (0, H)
 ], dtype=np.float32)
 
-# Initialize control, robot, and ball state arrays
-control_points = np.zeros((4, 2), dtype=np.float32)
-robot_points = {"center": np.zeros(2, dtype=np.float32), 
-                "top": np.zeros(2, dtype=np.float32)}
-ball_point = np.array([-1000, -1000], dtype=np.float32)
-
 # Color Thresholds (Orange Ping Pong Ball) and Kernel
 lower_orange = np.array([0, 25, 50])
 upper_orange = np.array([179, 255, 255])
 kernel = np.ones((5, 5), np.uint8)
 
-detector = apriltag.Detector()
-H = None # Stores the calculated Homography matrix
-
-FRAME_DELAY = 0.2
+FRAME_DELAY = 0.2 # serial loop only
+PIPELINED = True # run capture / detection / publishing as separate stages
+PARALLEL_DETECT = False # pipelined + tag and ball detection in separate worker processes
+PARALLEL_SLOTS = 3 # frames in flight between the main process and the workers
+STATS_INTERVAL = 5 # seconds between pipeline stat reports
+HOMOGRAPHY_FILE = "homography.npy" # last good H, loaded on startup
+DRIFT_THRESHOLD = 2.0 # cm of control tag reprojection error before H is re-estimated
+TRACK_POSE = True # Kalman-filter the poses and publish predictions at a fixed rate. Single robot / ball only
+                  # (robot/position): with several robots or MAX_BALLS > 1 (field/poses) each detection is
+                  # published as it comes, since the tracker only filters the primary robot and largest ball
+PREDICT_HZ = 30 # publish rate of predicted poses (camera runs slower)
+PREDICT_HORIZON = 0.1 # seconds a track is extrapolated past its last measurement (1-2 frames), then it holds still
+TRACK_TAGS = "roi" # None = full tag detection every frame, "roi" = search only around the robot tag,
+                   # "flow" = move the robot tag's corners with optical flow; both cache the control tags
+ROI_FULL_EVERY = 30 # frames between forced full-frame tag detections ("roi")
+FLOW_FULL_EVERY = 10 # frames between full-frame tag detections ("flow"), flow drifts slowly in between
+SCALE_FACTOR = 0.5 # frames are resized by this before detection; H and ball sizes are in pixels at this scale
+AUTO_TUNE = True # adapt scale / quad_decimate / detector threads to FRAME_BUDGET (not in PARALLEL_DETECT mode)
+FRAME_BUDGET = 0.033 # seconds of detection per frame the auto-tuner aims for (p90)
+UNDISTORT = "off" # lens correction: "off", "frame" (remap whole frames) or "points" (only detected points)
+CAMERA_FILE = "camera_intrinsics.npz" # from camera_calibration.py
+BALL_ENGINE = "contours" # "contours" = original contour loop, "cc" = connected components. bench_ball_detect.py:
+                         # cc runs at ~0.5x the speed on a clean frame, breaks even somewhere between 100 and 250
+                         # blobs in the mask and is ~1.9x on heavy clutter; cc is needed for MAX_BALLS > 1
+BALL_ROI = True # only search for balls inside the field polygon (needs an H, not in PARALLEL_DETECT mode)
+FIELD_MARGIN = 5.0 # cm around the field corners that still counts as field for the ball search
+
+# tag id -> "control" (field corner, BL/BR/TR/TL by ascending id) or robot name.
+# With more than one robot or ball, poses go out as one field/poses message per frame.
+TAG_ROLES = {0: "control", 1: "control", 2: "control", 3: "control", 4: "robot"}
+MAX_BALLS = 1 # balls tracked per frame, more than 1 needs BALL_ENGINE = "cc"
+
+DEBUG_MODE = "window" # "headless" (no drawing / GUI at all), "window" (imshow) or "mjpeg" (browser)
+DEBUG_EVERY = 1 # only draw overlays every Nth frame
+DEBUG_PORT = 8080 # mjpeg mode: overlays at http://127.0.0.1:DEBUG_PORT/
+
+WIRE_FORMAT = "binary" # pose message format on robot/position, "json" for debugging
+POS_DEADBAND = 0.5 # cm of movement before a new pose is sent
+HEARTBEAT = 1.0 # seconds, resend an unchanged pose this often
+
+VIDEO_SOURCE = 1 # camera index, or path to a recording to replay
+RECORD_TO = None # e.g. "session.avi" to record the live feed for offline benchmarking
 
 mqtt_url = "71b19996472b44ef8901c930925513fd.s1.eu.hivemq.cloud"
 mqtt_port = 8883
 mqtt_username = "hiveular"
 mqtt_pass = "1HiveMind"
 
-client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-client.username_pw_set(username=mqtt_username, password=mqtt_pass)
-client.tls_set()
-print("connecting to mqtt")
-client.connect(mqtt_url, mqtt_port)
-print("starting mqtt loop")
-client.loop_start()
-
-print("initializing webcam")
-cap = cv2.VideoCapture(1)
-
-# Check if camera opened successfully
-if not cap.isOpened():
-    raise RuntimeError("Error: Could not open camera")
-
-try:
-    print("starting processing loop")
-    while True:
-        # raw_color_img = cv2.imread('test2.jpg')
-        ret, raw_color_img = cap.read()
-        if not ret:
-            print("couldn't capture frame, continuing")
-            time.sleep(0.1)
-            continue
-        color_img, grayscale_img, hsv_img = process_image(raw_color_img, scale_factor=0.5)
-        
-        # detect apriltags
-        control_tag_count, robot_found = detect_apriltags(grayscale_img, detector, color_img, control_points, robot_points)
-        
-        # detect ball
-        ball_point, ball_found = detect_ball(hsv_img, color_img, lower_orange, upper_orange, kernel)
-
-        # show image with all the overlays of detected tags + ball
-        cv2.imshow("Detection Overlay", color_img)
-
-        if control_tag_count != 4:
-            print(f"Calibration tags missing: Found only {control_tag_count} out of 4.")
-            time.sleep(0.1)
-            continue
-        
-        # Calculate homography matrix H once (camera is stationary)
-        if H is None:
-            print("Calculating Homography Matrix")
-            H, mask = cv2.findHomography(control_points, target_points, method=cv2.RANSAC)
-            print("Homography Matrix calculated.")
-        # if H is still None, there was a problem
-        if H is None:
-            print("Homography calculation failed")
-            time.sleep(0.1)
-            continue
-
-        # calculate robot and ball coords with homography
-        robot_x, robot_y, robot_theta, ball_x, ball_y = calculate_pose(H, robot_points, ball_point)
 
-        pos_data_json = json.dumps({
-            'robot_found':robot_found,
-            'robot_x':float(robot_x),
-            'robot_y':float(robot_y),
-            'robot_theta':float(robot_theta),
-            'ball_found':ball_found,
-            'ball_x':float(ball_x),
-            'ball_y':float(ball_y)
-            })
+def main():
+    detector = apriltag.Detector()
+    registry = TagRegistry(TAG_ROLES)
+    full_every = FLOW_FULL_EVERY if TRACK_TAGS == "flow" else ROI_FULL_EVERY
+    tag_tracker = make_tag_tracker(TRACK_TAGS, detector, full_every, registry)
+    ball_detector = detect_ball_cc if BALL_ENGINE == "cc" else detect_ball
+    homography = HomographyManager(target_points, HOMOGRAPHY_FILE, DRIFT_THRESHOLD)
+    view = DebugView(DEBUG_MODE, DEBUG_EVERY, DEBUG_PORT)
+    tuner = AutoTuner(FRAME_BUDGET) if AUTO_TUNE and not PARALLEL_DETECT else None
+    undistorter = LensUndistorter(CAMERA_FILE, UNDISTORT) if UNDISTORT != "off" else None
+    field_roi = FieldRoi(target_points, FIELD_MARGIN) if BALL_ROI else None
+    locator = Locator(detector, homography, lower_orange, upper_orange, kernel, tag_tracker, ball_detector, view,
+                      registry, MAX_BALLS, tuner, undistorter, field_roi)
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
+    client.username_pw_set(username=mqtt_username, password=mqtt_pass)
+    client.tls_set()
+    print("connecting to mqtt")
+    client.connect(mqtt_url, mqtt_port)
+    print("starting mqtt loop")
+    client.loop_start()
+    field_mode = len(registry.robot_names) > 1 or MAX_BALLS > 1
+    if field_mode:
+        pose_publisher = FieldPublisher(client, "field/poses", registry.robot_ids, WIRE_FORMAT, POS_DEADBAND,
+                                        heartbeat=HEARTBEAT)
+    else:
+        pose_publisher = PosePublisher(client, "robot/position", WIRE_FORMAT, POS_DEADBAND, heartbeat=HEARTBEAT)
+
+    print("initializing webcam")
+    cap = open_source(VIDEO_SOURCE, record_to=RECORD_TO)
+
+    try:
+        # Check if camera opened successfully
+        if not cap.isOpened():
+            raise RuntimeError("Error: Could not open camera")
+
+        # predictions would republish the other robots / balls' last raw detection as live, see TRACK_POSE
+        pose_tracker = PoseTracker(max_extrapolation=PREDICT_HORIZON) if TRACK_POSE and not field_mode else None
+        if TRACK_POSE and field_mode:
+            print("TRACK_POSE is off for field/poses (several robots / balls), publishing detections as they come")
+
+        print("starting processing loop")
+        if PARALLEL_DETECT:
+            parallel = ParallelDetector(BALL_ENGINE, lower_orange, upper_orange, kernel,
+                                        TRACK_TAGS, full_every, n_slots=PARALLEL_SLOTS,
+                                        registry=registry, max_balls=MAX_BALLS)
+            run_parallel(cap, locator, parallel, pose_publisher, pose_tracker)
+        elif PIPELINED:
+            run_pipelined(cap, locator, pose_publisher, pose_tracker)
+        else:
+            run_serial(cap, locator, pose_publisher, pose_tracker)
 
-        print("publishing: ", pos_data_json)
+    except RuntimeError as e:
+        print(f"FATAL ERROR: {e}")
+    except FileNotFoundError as e:
+        print(f"FATAL ERROR: {e}")
+    finally:
+        # ensure windows are closed
+        client.loop_stop()
+        cap.release()
+        view.close()
 
-        msg_info = client.publish("robot/position", pos_data_json, qos=0)
 
-        time.sleep(FRAME_DELAY)
-        cv2.waitKey(1)
-
-except RuntimeError as e:
-    print(f"FATAL ERROR: {e}")
-except FileNotFoundError as e:
-    print(f"FATAL ERROR: {e}")
-finally:
-    # ensure windows are closed
-    client.loop_stop()
-    cv2.destroyAllWindows()
-    cv2.waitKey(1)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap "did anything change?" check in front of an expensive detector.
+
+    Each frame is shrunk by `scale` and turned gray, then compared with a
+    running background (cv2.accumulateWeighted) of the part of the image
+    below `top_y`. If more than min_fraction of those pixels differ from the
+    background by over `threshold`, the frame counts as motion. The gate stays
+    open for `hold` more frames after the last motion so a ball that slows
+    down or stops is still looked at. All buffers are reused; a 640x480 frame
+    costs one small resize and a few passes over ~80x50 pixels.
+    """
+
+    def __init__(self, scale=0.125, threshold=20, min_fraction=0.002, alpha=0.05, hold=5):
+        self.scale = scale
+        self.threshold = threshold
+        self.min_fraction = min_fraction
+        self.alpha = alpha          # background update rate, higher forgets faster
+        self.hold = hold
+
+        self.background = None      # float32 running average of the zone
+        self._zone_top = None
+        self._small = None
+        self._gray = None
+        self._background8 = None
+        self._diff = None
+        self.open_for = 0
+        self.checked = 0
+        self.skipped = 0
+
+    def reset(self):
+        """Forget the background, the next frame is always let through"""
+        self.background = None
+
+    def _allocate(self, small_shape, zone_top):
+        self._zone_top = zone_top
+        zone_shape = (small_shape[0] - zone_top, small_shape[1])
+        self._gray = np.empty(small_shape, dtype=np.uint8)
+        self._background8 = np.empty(zone_shape, dtype=np.uint8)
+        self._diff = np.empty(zone_shape, dtype=np.uint8)
+
+    def changed(self, frame, top_y=0):
+        """True if something moved below pixel row top_y of this BGR frame (or the gate is still held open)"""
+        self.checked += 1
+        height, width = frame.shape[:2]
+        small_size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+        if self._small is None or self._small.shape[1::-1] != small_size:
+            self._small = np.empty((small_size[1], small_size[0], 3), dtype=np.uint8)
+            self.background = None
+        cv2.resize(frame, small_size, dst=self._small, interpolation=cv2.INTER_AREA)
+
+        zone_top = min(int(top_y * self.scale), small_size[1] - 1)
+        if zone_top != self._zone_top or self._gray is None or self._gray.shape != self._small.shape[:2]:
+            # new frame size or the top line moved: start a new background for the new zone
+            self._allocate(self._small.shape[:2], zone_top)
+            self.background = None
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        zone = self._gray[zone_top:]
+
+        if self.background is None:
+            self.background = zone.astype(np.float32)
+            self.open_for = self.hold
+            return True
+
+        cv2.convertScaleAbs(self.background, dst=self._background8)
+        cv2.absdiff(zone, self._background8, dst=self._diff)
+        cv2.threshold(self._diff, self.threshold, 255, cv2.THRESH_BINARY, dst=self._diff)
+        moving = cv2.countNonZero(self._diff) > self.min_fraction * self._diff.size
+        cv2.accumulateWeighted(zone, self.background, self.alpha)
+
+        if moving:
+            self.open_for = self.hold
+            return True
+        if self.open_for > 0:
+            self.open_for -= 1
+            return True
+        self.skipped += 1
+        return False
+
+    def summary(self):
+        if self.checked == 0:
+            return "motion gate: no frames"
+        return f"motion gate skipped {self.skipped}/{self.checked} frames ({self.skipped / self.checked:.0%})"
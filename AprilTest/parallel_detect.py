@@ -0,0 +1,190 @@
+import multiprocessing as mp
+import queue
+import numpy as np
+from multiprocessing import shared_memory
+
+from tag_registry import DEFAULT_REGISTRY
+
+
+# ---------------- worker processes ----------------
+# Both workers attach to the same shared-memory ring of resized BGR frames, so a
+# frame is written once by the main process and never pickled. The queues only
+# carry (seq, slot) in and small result tuples out.
+
+def _attach(shm_name, n_slots, shape):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    frames = np.ndarray((n_slots,) + shape, dtype=np.uint8, buffer=shm.buf)
+    return shm, frames
+
+
+def tag_worker(shm_name, n_slots, shape, jobs, results, registry, track_tags, full_every, detector_kwargs):
+    import cv2
+    import pyapriltags as apriltag
+    from locate_refactored import detect_apriltags
+    from tag_tracking import make_tag_tracker
+
+    shm, frames = _attach(shm_name, n_slots, shape)
+    detector = apriltag.Detector(**detector_kwargs)
+    tag_tracker = make_tag_tracker(track_tags, detector, full_every, registry)
+    control_points = np.zeros((4, 2), dtype=np.float32)
+    robot_points = registry.new_robot_points()
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            seq, slot = job
+            grayscale_img = cv2.cvtColor(frames[slot], cv2.COLOR_BGR2GRAY)
+            if tag_tracker is not None:
+                control_tag_count, robots_found = tag_tracker.detect(grayscale_img, None, control_points, robot_points)
+            else:
+                control_tag_count, robots_found = detect_apriltags(grayscale_img, detector, None, control_points,
+                                                                   robot_points, registry)
+            robots = {name: (np.array(robot_points[name]["center"]), np.array(robot_points[name]["top"]))
+                      for name in robots_found}
+            results.put(("tags", seq, (control_tag_count, control_points.copy(), robots_found, robots)))
+    finally:
+        del frames
+        shm.close()
+
+
+def ball_worker(shm_name, n_slots, shape, jobs, results, engine, max_balls, lower_thresh, upper_thresh, kernel):
+    import cv2
+    from locate_refactored import detect_ball, detect_balls
+    from ball_detection import detect_ball_cc
+
+    shm, frames = _attach(shm_name, n_slots, shape)
+    ball_detector = detect_ball_cc if engine == "cc" else detect_ball
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            seq, slot = job
+            hsv_img = cv2.cvtColor(frames[slot], cv2.COLOR_BGR2HSV)
+            ball_points = detect_balls(hsv_img, None, ball_detector, lower_thresh, upper_thresh, kernel, max_balls)
+            results.put(("ball", seq, ball_points))
+    finally:
+        del frames
+        shm.close()
+
+
+# ---------------- main process side ----------------
+
+class ParallelDetector:
+    """
+    Runs AprilTag decoding and ball segmentation for the same frame at the
+    same time, in two worker processes, and joins their results by frame
+    sequence number.
+
+    Frames go through a ring of `n_slots` shared-memory slots. Up to n_slots
+    frames can be in flight; when the ring is full submit() refuses the frame
+    (it's dropped as stale, the caller moves on to a newer one).
+    """
+
+    def __init__(self, engine="contours", lower_thresh=None, upper_thresh=None, kernel=None,
+                 track_tags=False, full_every=30, detector_kwargs=None, n_slots=3,
+                 registry=DEFAULT_REGISTRY, max_balls=1):
+        self.engine = engine
+        self.registry = registry
+        self.max_balls = max_balls
+        self.lower_thresh = lower_thresh
+        self.upper_thresh = upper_thresh
+        self.kernel = kernel
+        self.track_tags = track_tags
+        self.full_every = full_every
+        self.detector_kwargs = detector_kwargs or {}
+        self.n_slots = n_slots
+
+        self.shape = None
+        self.shm = None
+        self.frames = None
+        self.workers = []
+        self.free_slots = list(range(n_slots))
+        self.in_flight = {}  # seq -> {"slot", "t_capture", "tags", "ball"}
+        self.last_done = 0
+        self.dropped = 0
+        self.stale = 0
+
+    def _start(self, shape):
+        ctx = mp.get_context("spawn") # same behaviour on macOS / Windows / Linux
+        self.shape = shape
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * self.n_slots)
+        self.frames = np.ndarray((self.n_slots,) + shape, dtype=np.uint8, buffer=self.shm.buf)
+        self.tag_jobs = ctx.Queue()
+        self.ball_jobs = ctx.Queue()
+        self.results = ctx.Queue()
+        self.workers = [
+            ctx.Process(target=tag_worker, name="tag-worker", daemon=True,
+                        args=(self.shm.name, self.n_slots, shape, self.tag_jobs, self.results,
+                              self.registry, self.track_tags, self.full_every, self.detector_kwargs)),
+            ctx.Process(target=ball_worker, name="ball-worker", daemon=True,
+                        args=(self.shm.name, self.n_slots, shape, self.ball_jobs, self.results,
+                              self.engine, self.max_balls, self.lower_thresh, self.upper_thresh, self.kernel)),
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, seq, t_capture, color_img):
+        """Hand a resized BGR frame to both workers. Returns False (frame dropped) if the ring is full."""
+        if self.shm is None:
+            self._start(color_img.shape)
+        if color_img.shape != self.shape:
+            raise ValueError(f"frame shape changed from {self.shape} to {color_img.shape}")
+        if not self.free_slots:
+            self.dropped += 1
+            return False
+        slot = self.free_slots.pop()
+        self.frames[slot] = color_img
+        self.in_flight[seq] = {"slot": slot, "t_capture": t_capture, "tags": None, "ball": None}
+        self.tag_jobs.put((seq, slot))
+        self.ball_jobs.put((seq, slot))
+        return True
+
+    def can_submit(self):
+        return self.shm is None or bool(self.free_slots)
+
+    def collect(self, timeout=0.0):
+        """
+        Joined results that are complete, oldest first, as
+        (seq, t_capture, tag_result, ball_result). Waits up to `timeout` for the first one.
+        tag_result = (control_tag_count, control_points, robots_found, {name: (center, top)})
+        ball_result = (N, 2) ball points, largest first
+        """
+        done = []
+        if self.shm is None:
+            return done # no frame submitted yet
+        block = timeout > 0
+        while True:
+            try:
+                kind, seq, result = self.results.get(block, timeout) if block else self.results.get_nowait()
+            except queue.Empty:
+                break
+            block = False
+            entry = self.in_flight.get(seq)
+            if entry is None:
+                continue
+            entry[kind] = result
+            if entry["tags"] is not None and entry["ball"] is not None:
+                del self.in_flight[seq]
+                self.free_slots.append(entry["slot"])
+                if seq < self.last_done:
+                    self.stale += 1 # a newer frame already finished, don't go backwards
+                    continue
+                self.last_done = seq
+                done.append((seq, entry["t_capture"], entry["tags"], entry["ball"]))
+        return done
+
+    def close(self):
+        if self.shm is None:
+            return
+        self.tag_jobs.put(None)
+        self.ball_jobs.put(None)
+        for worker in self.workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+        self.frames = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
@@ -0,0 +1,230 @@
+import json
+import math
+import struct
+import time
+
+# Binary pose message, little-endian, fixed 100 bytes:
+#   magic 'P' | version | flags | pad | seq (u32, per message) | frame_seq (u32, camera frame)
+#   stamp (f64, unix seconds the frame was captured) | sent_stamp (f64, unix seconds it was published)
+#   robot_x, robot_y, robot_theta, ball_x, ball_y, h_drift                      (f32 x6)
+#   robot_vx, robot_vy, robot_omega, ball_vx, ball_vy                            (f32 x5)
+#   robot_cov (var_x, cov_xy, var_y, var_theta), ball_cov (var_x, cov_xy, var_y) (f32 x7)
+# Positions in cm, angles in radians. Velocity/covariance fields are only
+# meaningful when FLAG_TRACKED is set (poses from PoseTracker).
+# Any change to the layout needs a new version number.
+POSE_MAGIC = ord("P")
+POSE_VERSION = 2
+POSE_STRUCT = struct.Struct("<BBBxIIdd18f")
+
+FLAG_ROBOT_FOUND = 0x01
+FLAG_BALL_FOUND = 0x02
+FLAG_TRACKED = 0x04
+
+# Field message (field/poses), every robot and ball of one frame, little-endian:
+#   header: magic 'F' | version | n_robots | n_balls | seq (u32) | frame_seq (u32)
+#           stamp (f64, capture) | sent_stamp (f64) | h_drift (f32)
+#   n_robots x (tag_id (u16, tag36h11 ids go to 586) | found (u8) | pad | x, y, theta (f32 x3))
+#   n_balls x (x, y (f32 x2)), largest ball first
+# Robots are identified by tag id, consumers map ids to names with their TagRegistry.
+FIELD_MAGIC = ord("F")
+FIELD_VERSION = 3
+FIELD_HEADER = struct.Struct("<BBBBIIddf")
+FIELD_ROBOT = struct.Struct("<HBxfff")
+FIELD_BALL = struct.Struct("<ff")
+
+_POSE_FIELDS = ("robot_x", "robot_y", "robot_theta", "ball_x", "ball_y", "h_drift")
+_TRACK_FIELDS = ("robot_vx", "robot_vy", "robot_omega", "ball_vx", "ball_vy")
+
+
+def encode_pose(pose, seq, stamp, sent_stamp):
+    flags = 0
+    if pose["robot_found"]:
+        flags |= FLAG_ROBOT_FOUND
+    if pose["ball_found"]:
+        flags |= FLAG_BALL_FOUND
+    tracked = "robot_cov" in pose or "ball_cov" in pose
+    if tracked:
+        flags |= FLAG_TRACKED
+    values = [pose.get(k, -1.0) for k in _POSE_FIELDS]
+    values += [pose.get(k, 0.0) for k in _TRACK_FIELDS]
+    values += pose.get("robot_cov", [0.0] * 4) + pose.get("ball_cov", [0.0] * 3)
+    return POSE_STRUCT.pack(POSE_MAGIC, POSE_VERSION, flags, seq & 0xFFFFFFFF, pose.get("frame_seq", 0) & 0xFFFFFFFF,
+                            stamp, sent_stamp, *values)
+
+
+def decode_pose(payload):
+    """Binary or JSON payload -> pose dict (same keys as the JSON message, plus seq, frame_seq, stamp and sent_stamp)"""
+    if payload[:1] == b"{":
+        return json.loads(payload.decode())
+    if len(payload) != POSE_STRUCT.size or payload[0] != POSE_MAGIC:
+        raise ValueError(f"not a pose message ({len(payload)} bytes)")
+    magic, version, flags, seq, frame_seq, stamp, sent_stamp, *values = POSE_STRUCT.unpack(payload)
+    if version != POSE_VERSION:
+        raise ValueError(f"unsupported pose message version {version}")
+    pose = dict(zip(_POSE_FIELDS, values[:6]))
+    pose["robot_found"] = bool(flags & FLAG_ROBOT_FOUND)
+    pose["ball_found"] = bool(flags & FLAG_BALL_FOUND)
+    if flags & FLAG_TRACKED:
+        pose.update(zip(_TRACK_FIELDS, values[6:11]))
+        pose["robot_cov"] = values[11:15]
+        pose["ball_cov"] = values[15:18]
+    pose["seq"] = seq
+    pose["frame_seq"] = frame_seq
+    pose["stamp"] = stamp
+    pose["sent_stamp"] = sent_stamp
+    return pose
+
+
+def encode_field(pose, seq, stamp, sent_stamp, robot_ids):
+    """pose: Locator pose dict (uses its robots/balls), robot_ids: robot name -> tag id"""
+    robots = pose["robots"]
+    balls = pose["balls"]
+    parts = [FIELD_HEADER.pack(FIELD_MAGIC, FIELD_VERSION, len(robots), len(balls),
+                               seq & 0xFFFFFFFF, pose.get("frame_seq", 0) & 0xFFFFFFFF, stamp, sent_stamp,
+                               pose.get("h_drift", -1.0))]
+    for name, robot in robots.items():
+        parts.append(FIELD_ROBOT.pack(robot_ids[name], robot["found"], robot["x"], robot["y"], robot["theta"]))
+    for x, y in balls:
+        parts.append(FIELD_BALL.pack(x, y))
+    return b"".join(parts)
+
+
+def decode_field(payload):
+    """field/poses payload -> {"seq", "frame_seq", "stamp", "sent_stamp", "h_drift",
+    "robots": {tag_id: {found, x, y, theta}}, "balls": [[x, y], ...]}"""
+    if len(payload) < FIELD_HEADER.size or payload[0] != FIELD_MAGIC:
+        raise ValueError(f"not a field message ({len(payload)} bytes)")
+    magic, version, n_robots, n_balls, seq, frame_seq, stamp, sent_stamp, h_drift = FIELD_HEADER.unpack_from(payload)
+    if version != FIELD_VERSION:
+        raise ValueError(f"unsupported field message version {version}")
+    if len(payload) != FIELD_HEADER.size + n_robots * FIELD_ROBOT.size + n_balls * FIELD_BALL.size:
+        raise ValueError(f"field message length {len(payload)} doesn't match {n_robots} robots, {n_balls} balls")
+    offset = FIELD_HEADER.size
+    robots = {}
+    for _ in range(n_robots):
+        tag_id, found, x, y, theta = FIELD_ROBOT.unpack_from(payload, offset)
+        robots[tag_id] = {"found": bool(found), "x": x, "y": y, "theta": theta}
+        offset += FIELD_ROBOT.size
+    balls = [list(FIELD_BALL.unpack_from(payload, offset + i * FIELD_BALL.size)) for i in range(n_balls)]
+    return {"seq": seq, "frame_seq": frame_seq, "stamp": stamp, "sent_stamp": sent_stamp, "h_drift": h_drift,
+            "robots": robots, "balls": balls}
+
+
+class PosePublisher:
+    """
+    Publishes poses only when they change meaningfully: robot or ball moved
+    more than `pos_deadband` cm, robot turned more than `angle_deadband` rad,
+    or a found flag flipped. Otherwise it sends a heartbeat every `heartbeat`
+    seconds so consumers can tell the feed is alive. seq counts sent messages,
+    so a gap means a message was lost. Each message also carries the camera
+    frame it came from (pose["frame_seq"]) and that frame's capture time
+    (pose["capture_stamp"], the message stamp) next to its send time, so
+    consumers can tell how old a pose is and where the time went.
+
+    fmt="binary" sends encode_pose() messages, fmt="json" the old readable
+    JSON (plus seq/stamp) for debugging.
+    """
+
+    def __init__(self, client, topic, fmt="binary", pos_deadband=0.5, angle_deadband=math.radians(1.0),
+                 heartbeat=1.0, qos=0):
+        if fmt not in ("binary", "json"):
+            raise ValueError(f"fmt must be 'binary' or 'json', not {fmt!r}")
+        self.client = client
+        self.topic = topic
+        self.fmt = fmt
+        self.pos_deadband = pos_deadband
+        self.angle_deadband = angle_deadband
+        self.heartbeat = heartbeat
+        self.qos = qos
+
+        self.seq = 0
+        self.last_sent = None
+        self.last_sent_time = 0.0
+        self.sent = 0
+        self.suppressed = 0
+
+    def _changed(self, pose):
+        last = self.last_sent
+        if last is None:
+            return True
+        if pose["robot_found"] != last["robot_found"] or pose["ball_found"] != last["ball_found"]:
+            return True
+        if pose["robot_found"]:
+            if math.hypot(pose["robot_x"] - last["robot_x"], pose["robot_y"] - last["robot_y"]) > self.pos_deadband:
+                return True
+            turn = (pose["robot_theta"] - last["robot_theta"] + math.pi) % (2 * math.pi) - math.pi
+            if abs(turn) > self.angle_deadband:
+                return True
+        if pose["ball_found"]:
+            if math.hypot(pose["ball_x"] - last["ball_x"], pose["ball_y"] - last["ball_y"]) > self.pos_deadband:
+                return True
+        return False
+
+    def _encode(self, pose, stamp, sent_stamp):
+        if self.fmt == "binary":
+            return encode_pose(pose, self.seq, stamp, sent_stamp)
+        # robots / balls are the field message's job
+        single = {k: v for k, v in pose.items() if k not in ("robots", "balls", "capture_stamp")}
+        return json.dumps(dict(single, seq=self.seq, stamp=stamp, sent_stamp=sent_stamp))
+
+    def publish(self, pose, stamp=None):
+        """Send pose if it changed (or the heartbeat is due). Returns True if it was sent.
+        stamp defaults to the pose's capture_stamp, or now if it has none."""
+        now = time.monotonic()
+        if not self._changed(pose) and now - self.last_sent_time < self.heartbeat:
+            self.suppressed += 1
+            return False
+
+        self.seq += 1
+        sent_stamp = time.time()
+        if stamp is None:
+            stamp = pose.get("capture_stamp", sent_stamp)
+        payload = self._encode(pose, stamp, sent_stamp)
+        if self.fmt == "json":
+            print("publishing: ", payload)
+        self.client.publish(self.topic, payload, qos=self.qos)
+
+        self.last_sent = pose
+        self.last_sent_time = now
+        self.sent += 1
+        return True
+
+
+class FieldPublisher(PosePublisher):
+    """
+    PosePublisher for the whole field: one message per frame with every
+    robot and ball (encode_field), sent when any of them changed meaningfully.
+    robot_ids maps robot names to their tag ids (TagRegistry.robot_ids).
+    """
+
+    def __init__(self, client, topic, robot_ids, fmt="binary", pos_deadband=0.5, angle_deadband=math.radians(1.0),
+                 heartbeat=1.0, qos=0):
+        super().__init__(client, topic, fmt, pos_deadband, angle_deadband, heartbeat, qos)
+        self.robot_ids = robot_ids
+
+    def _changed(self, pose):
+        last = self.last_sent
+        if last is None or len(pose["balls"]) != len(last["balls"]):
+            return True
+        for name, robot in pose["robots"].items():
+            prev = last["robots"].get(name)
+            if prev is None or robot["found"] != prev["found"]:
+                return True
+            if robot["found"]:
+                if math.hypot(robot["x"] - prev["x"], robot["y"] - prev["y"]) > self.pos_deadband:
+                    return True
+                turn = (robot["theta"] - prev["theta"] + math.pi) % (2 * math.pi) - math.pi
+                if abs(turn) > self.angle_deadband:
+                    return True
+        for (x, y), (prev_x, prev_y) in zip(pose["balls"], last["balls"]):
+            if math.hypot(x - prev_x, y - prev_y) > self.pos_deadband:
+                return True
+        return False
+
+    def _encode(self, pose, stamp, sent_stamp):
+        if self.fmt == "binary":
+            return encode_field(pose, self.seq, stamp, sent_stamp, self.robot_ids)
+        robots = {self.robot_ids[name]: robot for name, robot in pose["robots"].items()}
+        return json.dumps({"seq": self.seq, "frame_seq": pose.get("frame_seq", 0), "stamp": stamp,
+                           "sent_stamp": sent_stamp, "h_drift": pose.get("h_drift", -1.0),
+                           "robots": robots, "balls": pose["balls"]})
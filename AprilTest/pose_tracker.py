@@ -0,0 +1,206 @@
+import math
+import threading
+import time
+import numpy as np
+
+TWO_PI = 2 * math.pi
+
+
+def wrap_angle(angle):
+    """Wrap to [-pi, pi)"""
+    return (angle + math.pi) % TWO_PI - math.pi
+
+
+class ConstantVelocityKF:
+    """
+    Kalman filter with a constant-velocity model over `n` measured axes.
+    State is [p_0 .. p_n-1, v_0 .. v_n-1]; only the positions are measured.
+
+    Axes listed in `angle_axes` are angles: innovations are wrapped to
+    [-pi, pi) so 359deg -> 1deg is a 2deg step, and the estimate is kept in
+    [0, 2pi) to match calculate_pose.
+    """
+
+    def __init__(self, n, accel_noise, meas_noise, angle_axes=(), gate=25.0, max_rejects=3):
+        self.n = n
+        self.accel_noise = np.broadcast_to(np.asarray(accel_noise, dtype=np.float64), (n,))
+        self.R = np.diag(np.broadcast_to(np.asarray(meas_noise, dtype=np.float64), (n,)))
+        self.angle_axes = list(angle_axes)
+        self.gate = gate               # Mahalanobis^2 above this is treated as an outlier
+        self.max_rejects = max_rejects # that many outliers in a row -> the object really jumped, re-init
+        self.Hm = np.hstack([np.eye(n), np.zeros((n, n))])
+
+        self.x = None
+        self.P = None
+        self.t = None
+        self.rejects = 0
+
+    def initialized(self):
+        return self.x is not None
+
+    def reset(self, z, t):
+        n = self.n
+        self.x = np.concatenate([np.asarray(z, dtype=np.float64), np.zeros(n)])
+        # velocity unknown at first: start it wide
+        self.P = np.diag(np.concatenate([np.diag(self.R), np.full(n, 100.0)]))
+        self.t = t
+        self.rejects = 0
+
+    def _transition(self, dt):
+        n = self.n
+        F = np.eye(2 * n)
+        F[:n, n:] = np.eye(n) * dt
+        # white-noise acceleration
+        q = self.accel_noise
+        Q = np.zeros((2 * n, 2 * n))
+        Q[:n, :n] = np.diag(q * dt ** 3 / 3)
+        Q[:n, n:] = Q[n:, :n] = np.diag(q * dt ** 2 / 2)
+        Q[n:, n:] = np.diag(q * dt)
+        return F, Q
+
+    def _normalize(self, x):
+        for i in self.angle_axes:
+            x[i] %= TWO_PI
+        return x
+
+    def predict(self, t):
+        """State and covariance extrapolated to time t, without changing the filter"""
+        dt = max(0.0, t - self.t)
+        F, Q = self._transition(dt)
+        x = self._normalize(F @ self.x)
+        P = F @ self.P @ F.T + Q
+        return x, P
+
+    def update(self, z, t):
+        """Fold in a measurement taken at time t. Returns False if it was gated out as an outlier."""
+        if self.x is None:
+            self.reset(z, t)
+            return True
+        if t < self.t:
+            return False # older than what we've already used
+
+        x, P = self.predict(t)
+        y = np.asarray(z, dtype=np.float64) - x[:self.n]
+        for i in self.angle_axes:
+            y[i] = wrap_angle(y[i])
+        S = self.Hm @ P @ self.Hm.T + self.R
+        S_inv = np.linalg.inv(S)
+
+        if float(y @ S_inv @ y) > self.gate:
+            self.rejects += 1
+            if self.rejects >= self.max_rejects:
+                self.reset(z, t)
+                return True
+            return False
+
+        K = P @ self.Hm.T @ S_inv
+        self.x = self._normalize(x + K @ y)
+        self.P = (np.eye(2 * self.n) - K @ self.Hm) @ P
+        self.t = t
+        self.rejects = 0
+        return True
+
+
+class PoseTracker:
+    """
+    Smooths the raw per-frame poses from Locator.locate() and predicts them
+    forward in time. The robot is filtered over (x, y, theta), the ball over
+    (x, y). Thread safe: the detection stage calls update(), a publisher
+    calls predict() at its own rate.
+
+    A track is only extrapolated `max_extrapolation` seconds past its last
+    measurement. After that it holds that position with zero velocity, so a
+    lost robot or ball isn't sent sliding off the field until max_age drops
+    it. Its covariance keeps growing with the real time.
+    """
+
+    def __init__(self, max_age=0.5, max_extrapolation=0.1,
+                 robot_accel_noise=(50.0, 50.0, 2.0), robot_meas_noise=(0.5, 0.5, 0.003),
+                 ball_accel_noise=500.0, ball_meas_noise=1.0):
+        self.max_age = max_age # seconds without a measurement before a track reports not found
+        self.max_extrapolation = max_extrapolation
+        self.robot = ConstantVelocityKF(3, robot_accel_noise, robot_meas_noise, angle_axes=[2])
+        self.ball = ConstantVelocityKF(2, ball_accel_noise, ball_meas_noise)
+        self.extra = {} # non-kinematic fields (e.g. h_drift) passed through from the last pose
+                        # (not robots / balls: those aren't filtered, so they'd go stale as "found")
+        self._lock = threading.Lock()
+
+    def update(self, pose, t):
+        """pose: dict from Locator.locate(), t: capture time (time.perf_counter) of its frame"""
+        with self._lock:
+            if pose['robot_found']:
+                self.robot.update([pose['robot_x'], pose['robot_y'], pose['robot_theta']], t)
+            if pose['ball_found']:
+                self.ball.update([pose['ball_x'], pose['ball_y']], t)
+            self.extra = {k: v for k, v in pose.items()
+                          if not k.startswith(('robot_', 'ball_')) and k not in ('robots', 'balls')}
+
+    def predict(self, t):
+        """Pose dict (same fields as Locator.locate() plus velocities/covariance) predicted to time t, or None"""
+        with self._lock:
+            if not self.robot.initialized() and not self.ball.initialized():
+                return None
+            pose = dict(self.extra)
+
+            robot_found = self.robot.initialized() and t - self.robot.t <= self.max_age
+            pose['robot_found'] = robot_found
+            if self.robot.initialized():
+                x, P = self._predict(self.robot, t, velocity_axes=slice(3, 6))
+                pose.update(robot_x=float(x[0]), robot_y=float(x[1]), robot_theta=float(x[2]),
+                            robot_vx=float(x[3]), robot_vy=float(x[4]), robot_omega=float(x[5]),
+                            # [var_x, cov_xy, var_y, var_theta]
+                            robot_cov=[float(P[0, 0]), float(P[0, 1]), float(P[1, 1]), float(P[2, 2])])
+            else:
+                pose.update(robot_x=0.0, robot_y=0.0, robot_theta=0.0)
+
+            ball_found = self.ball.initialized() and t - self.ball.t <= self.max_age
+            pose['ball_found'] = ball_found
+            if self.ball.initialized():
+                x, P = self._predict(self.ball, t, velocity_axes=slice(2, 4))
+                pose.update(ball_x=float(x[0]), ball_y=float(x[1]),
+                            ball_vx=float(x[2]), ball_vy=float(x[3]),
+                            # [var_x, cov_xy, var_y]
+                            ball_cov=[float(P[0, 0]), float(P[0, 1]), float(P[1, 1])])
+            else:
+                pose.update(ball_x=-1000.0, ball_y=-1000.0)
+            return pose
+
+    def _predict(self, track, t, velocity_axes):
+        """track.predict(t), but the state stops moving max_extrapolation seconds after the last measurement"""
+        horizon = track.t + self.max_extrapolation
+        if t <= horizon:
+            return track.predict(t)
+        x, _ = track.predict(horizon)
+        _, P = track.predict(t)
+        x[velocity_axes] = 0.0 # holding still
+        return x, P
+
+
+class PredictionPublisher(threading.Thread):
+    """Publishes tracker.predict(now) every 1/rate_hz seconds, independent of the camera rate."""
+
+    def __init__(self, tracker, publish_fn, rate_hz=30.0, stats=None):
+        super().__init__(name="predict-publish", daemon=True)
+        self.tracker = tracker
+        self.publish_fn = publish_fn
+        self.period = 1.0 / rate_hz
+        self.stats = stats
+        self.running = True
+
+    def run(self):
+        next_t = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            pose = self.tracker.predict(now)
+            if pose is not None:
+                self.publish_fn(pose)
+                if self.stats is not None:
+                    self.stats.record(time.perf_counter() - now)
+            # fixed schedule, skipping ticks we've already missed rather than bursting
+            next_t += self.period
+            if next_t < now:
+                next_t = now + self.period
+            time.sleep(max(0.0, next_t - time.perf_counter()))
+
+    def stop(self):
+        self.running = False
@@ -0,0 +1,37 @@
+import numpy as np
+
+CONTROL = "control"
+
+# tag id -> role. "control" tags are the field corners; sorted by id they map onto
+# target_points in order (BL, BR, TR, TL). Every other entry is a robot, and the role
+# is its name. e.g. {0: "control", 1: "control", 2: "control", 3: "control", 4: "red", 5: "blue"}
+DEFAULT_TAGS = {0: CONTROL, 1: CONTROL, 2: CONTROL, 3: CONTROL, 4: "robot"}
+
+
+class TagRegistry:
+    """
+    Which AprilTag id is what on the field: one of the four corner (control)
+    tags or a named robot. The first robot listed is the primary one, it fills
+    the single-robot robot_* pose fields that robot/position consumers use.
+    """
+
+    def __init__(self, tags=DEFAULT_TAGS):
+        control_ids = sorted(tag_id for tag_id, role in tags.items() if role == CONTROL)
+        if len(control_ids) != 4:
+            raise ValueError(f"need exactly 4 control tags, got {control_ids}")
+        self.control_index = {tag_id: corner for corner, tag_id in enumerate(control_ids)}
+
+        self.robots = {tag_id: role for tag_id, role in tags.items() if role != CONTROL}
+        self.robot_names = list(self.robots.values())
+        if len(set(self.robot_names)) != len(self.robot_names):
+            raise ValueError(f"robot names must be unique, got {self.robot_names}")
+        self.robot_ids = {name: tag_id for tag_id, name in self.robots.items()}
+        self.primary = self.robot_names[0] if self.robot_names else None
+
+    def new_robot_points(self):
+        """Empty center/top points for every robot, filled in by the tag detectors"""
+        return {name: {"center": np.zeros(2, dtype=np.float32), "top": np.zeros(2, dtype=np.float32)}
+                for name in self.robot_names}
+
+
+DEFAULT_REGISTRY = TagRegistry()
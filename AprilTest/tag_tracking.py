@@ -0,0 +1,327 @@
+import cv2
+import numpy as np
+
+from tag_registry import DEFAULT_REGISTRY
+
+
+class TagTrackerBase:
+    """
+    What RoiTagTracker and FlowTagTracker share: control tag centers cached
+    from full-frame detections, and the detect_apriltags() style output.
+    Subclasses keep their own robot state, cleared by _clear_robots() and
+    filled by _found_robot() during a full detection.
+    """
+
+    def __init__(self, detector, full_every, registry):
+        self.detector = detector
+        self.full_every = full_every
+        self.registry = registry
+
+        self.control_cache = {}      # corner index -> center, from the last full detection
+        self.frames_since_full = 0
+        self.full_count = 0
+
+    def reset(self):
+        self.control_cache = {}
+        self.frames_since_full = 0
+
+    def _detect_full(self, grayscale_img, robot_points):
+        tags = self.detector.detect(grayscale_img)
+        control_seen = {}
+        self._clear_robots()
+        for tag in tags:
+            if tag.tag_id in self.registry.control_index:
+                control_seen[self.registry.control_index[tag.tag_id]] = np.array(tag.center, dtype=np.float32)
+            elif tag.tag_id in self.registry.robots:
+                self._found_robot(self.registry.robots[tag.tag_id], tag, robot_points)
+        # only replace the cache with a complete set, so one occluded tag
+        # doesn't throw away the calibration we already have
+        if len(control_seen) == len(self.registry.control_index) or not self.control_cache:
+            self.control_cache = control_seen
+        self.full_count += 1
+        self.frames_since_full = 0
+
+    def _finish(self, color_img, control_points, robot_points, robots_found):
+        for corner, center in self.control_cache.items():
+            control_points[corner] = center
+        if color_img is None:
+            return len(self.control_cache), robots_found
+
+        for center in self.control_cache.values():
+            cv2.circle(color_img, (int(center[0]), int(center[1])), 10, (0, 0, 255), -1) # Draw center
+        for name in robots_found:
+            center = robot_points[name]["center"]
+            cv2.circle(color_img, (int(center[0]), int(center[1])), 10, (0, 0, 255), -1)
+            self._draw_robot(color_img, name)
+
+        return len(self.control_cache), robots_found
+
+    def _clear_robots(self):
+        raise NotImplementedError
+
+    def _found_robot(self, name, tag, robot_points):
+        raise NotImplementedError
+
+    def _draw_robot(self, color_img, name):
+        pass
+
+
+class RoiTagTracker(TagTrackerBase):
+    """
+    Drop-in replacement for detect_apriltags() that avoids decoding the whole
+    frame every time.
+
+    The control tags don't move, so once a full-frame detection has seen all
+    four their centers are cached. After that only a window around the last
+    known position of each robot tag is searched. A full-frame detection is
+    used again when a robot is lost in its window, or every `full_every` frames
+    so the cached control tags get refreshed and robots that came onto the
+    field get picked up.
+    """
+
+    def __init__(self, detector, full_every=30, roi_scale=3.0, min_roi=60, registry=DEFAULT_REGISTRY):
+        super().__init__(detector, full_every, registry)
+        self.roi_scale = roi_scale   # window side = roi_scale * robot tag size
+        self.min_roi = min_roi       # smallest window side in pixels
+        self.robot_windows = {}      # robot name -> (center, tag size) of its last detection
+
+        # how the frames were handled, for tuning full_every (full_count is in the base)
+        self.roi_count = 0
+        self.roi_misses = 0
+
+    def reset(self):
+        super().reset()
+        self.robot_windows = {}
+
+    def summary(self):
+        return f"{self.full_count} full, {self.roi_count} roi, {self.roi_misses} roi misses"
+
+    def detect(self, grayscale_img, color_img, control_points, robot_points):
+        """Same contract as detect_apriltags(): fills the point arrays, returns (control_tag_count, robots_found).
+        color_img=None skips drawing."""
+        need_full = (len(self.control_cache) < len(self.registry.control_index)
+                     or not self.robot_windows
+                     or self.frames_since_full >= self.full_every)
+
+        if not need_full:
+            for name in list(self.robot_windows):
+                if not self._detect_roi(grayscale_img, name, robot_points):
+                    # lost a robot in its window, search everywhere this frame
+                    self.roi_misses += 1
+                    need_full = True
+                    break
+            else:
+                self.roi_count += 1
+                self.frames_since_full += 1
+
+        if need_full:
+            self._detect_full(grayscale_img, robot_points)
+        robots_found = [name for name in self.registry.robot_names if name in self.robot_windows]
+        return self._finish(color_img, control_points, robot_points, robots_found)
+
+    def _clear_robots(self):
+        self.robot_windows = {}
+
+    def _found_robot(self, name, tag, robot_points):
+        self._update_robot(name, tag.center, tag.corners, robot_points)
+
+    def _detect_roi(self, grayscale_img, name, robot_points):
+        img_h, img_w = grayscale_img.shape[:2]
+        (cx, cy), size = self.robot_windows[name]
+        half = max(self.min_roi, self.roi_scale * size) / 2
+        x0, y0 = max(0, int(cx - half)), max(0, int(cy - half))
+        x1, y1 = min(img_w, int(cx + half)), min(img_h, int(cy + half))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return False
+
+        # detector needs a contiguous buffer, slicing alone gives a strided view
+        window = np.ascontiguousarray(grayscale_img[y0:y1, x0:x1])
+        offset = np.array([x0, y0], dtype=np.float64)
+        tag_id = self.registry.robot_ids[name]
+        for tag in self.detector.detect(window):
+            if tag.tag_id == tag_id:
+                self._update_robot(name, tag.center + offset, tag.corners + offset, robot_points)
+                return True
+        return False
+
+    def _update_robot(self, name, center, corners, robot_points):
+        # Robot tag: Find center and orientation point
+        robot_points[name]["center"] = center
+        robot_points[name]["top"] = (corners[0] + corners[1]) / 2
+        self.robot_windows[name] = ((float(center[0]), float(center[1])), float(np.ptp(corners, axis=0).max()))
+
+
+# center of a tag quad = where its diagonals cross, like the detector's tag.center
+def quad_center(corners):
+    p0, p1, p2, p3 = corners
+    d1, d2 = p2 - p0, p3 - p1
+    denom = d1[0] * d2[1] - d1[1] * d2[0]
+    if abs(denom) < 1e-9:
+        return corners.mean(axis=0)
+    t = ((p1[0] - p0[0]) * d2[1] - (p1[1] - p0[1]) * d2[0]) / denom
+    return p0 + t * d1
+
+
+class FlowTagTracker(TagTrackerBase):
+    """
+    Drop-in replacement for detect_apriltags() that only decodes tags every
+    `full_every` frames. In between, the four corners of every robot tag are
+    moved with pyramidal Lucas-Kanade optical flow (all robots in one
+    calcOpticalFlowPyrLK call), which costs far less than a decode. The flow
+    only looks at a window `margin` pixels around the tags, not the whole frame.
+
+    Control tags are cached from full detections like in RoiTagTracker.
+    Flow alone lags a turning tag a little every frame (the window's content
+    rotates, LK only fits a shift), so the flowed corners are snapped back
+    onto the tag's actual corners with cornerSubPix. A flow frame is only
+    trusted if every corner passes a forward-backward check (tracked back to
+    within fb_max pixels of where it started), the snap moved it less than
+    max_snap pixels, and each quad still looks like the tag: convex, same
+    winding, mean side within max_size_change of the last detection and no
+    side much shorter than the others. Otherwise the frame falls back to a
+    full detection.
+    """
+
+    def __init__(self, detector, full_every=10, win_size=21, max_level=3, margin=48, fb_max=1.0, refine_win=3,
+                 max_snap=2.0, max_size_change=0.2, registry=DEFAULT_REGISTRY):
+        super().__init__(detector, full_every, registry)
+        self.win_size = (win_size, win_size)
+        self.max_level = max_level
+        self.margin = margin         # pixels around the tags the flow searches, > the most a tag moves per frame
+        self.fb_max = fb_max
+        self.refine_win = (refine_win, refine_win)
+        self.max_snap = max_snap
+        self.max_size_change = max_size_change
+        self.criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03)
+        self.refine_criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.01)
+
+        self.robot_corners = {}      # robot name -> (4, 2) corners in the last frame
+        self.robot_shapes = {}       # robot name -> (mean side, winding sign) at its last detection
+        self.prev_gray = None        # last frame, flow runs from it to the new one
+
+        # how the frames were handled, for tuning full_every (full_count is in the base)
+        self.flow_count = 0
+        self.flow_failures = 0
+
+    def reset(self):
+        super().reset()
+        self.robot_corners = {}
+        self.robot_shapes = {}
+        self.prev_gray = None
+
+    def summary(self):
+        return f"{self.full_count} full, {self.flow_count} flow, {self.flow_failures} flow checks failed"
+
+    def detect(self, grayscale_img, color_img, control_points, robot_points):
+        """Same contract as detect_apriltags(): fills the point arrays, returns (control_tag_count, robots_found).
+        color_img=None skips drawing."""
+        need_full = (len(self.control_cache) < len(self.registry.control_index)
+                     or not self.robot_corners
+                     or self.prev_gray is None
+                     or grayscale_img.shape != self.prev_gray.shape
+                     or self.frames_since_full >= self.full_every)
+
+        if not need_full:
+            if self._track(grayscale_img, robot_points):
+                self.flow_count += 1
+                self.frames_since_full += 1
+            else:
+                # tracking degraded, decode this frame
+                self.flow_failures += 1
+                need_full = True
+
+        if need_full:
+            self._detect_full(grayscale_img, robot_points)
+        # keep our own copy, the caller may reuse its buffer
+        if self.prev_gray is None or self.prev_gray.shape != grayscale_img.shape:
+            self.prev_gray = np.empty_like(grayscale_img)
+        np.copyto(self.prev_gray, grayscale_img)
+        robots_found = [name for name in self.registry.robot_names if name in self.robot_corners]
+        return self._finish(color_img, control_points, robot_points, robots_found)
+
+    def _clear_robots(self):
+        self.robot_corners = {}
+
+    def _found_robot(self, name, tag, robot_points):
+        corners = np.asarray(tag.corners, dtype=np.float32)
+        self.robot_shapes[name] = (self._sides(corners).mean(), np.sign(self._turns(corners).sum()))
+        self._update_robot(name, corners, robot_points, center=tag.center)
+
+    def _draw_robot(self, color_img, name):
+        cv2.polylines(color_img, [np.round(self.robot_corners[name]).astype(np.int32)], True, (255, 0, 255), 1)
+
+    def _track(self, grayscale_img, robot_points):
+        names = list(self.robot_corners)
+        corners = np.concatenate([self.robot_corners[name] for name in names])
+
+        # flow between the same window of both frames, so the pyramids are built for that window only
+        img_h, img_w = grayscale_img.shape[:2]
+        x0, y0 = np.maximum(np.floor(corners.min(axis=0) - self.margin).astype(int), 0)
+        x1, y1 = np.minimum(np.ceil(corners.max(axis=0) + self.margin).astype(int), (img_w, img_h))
+        if x1 - x0 < 8 or y1 - y0 < 8:
+            return False
+        prev_window = self.prev_gray[y0:y1, x0:x1]
+        window = grayscale_img[y0:y1, x0:x1]
+        offset = np.array([x0, y0], dtype=np.float32)
+
+        start = (corners - offset).reshape(-1, 1, 2)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_window, window, start, None, winSize=self.win_size,
+                                                    maxLevel=self.max_level, criteria=self.criteria)
+        if moved is None or not status.all():
+            return False
+        back, status, _ = cv2.calcOpticalFlowPyrLK(window, prev_window, moved, None, winSize=self.win_size,
+                                                   maxLevel=self.max_level, criteria=self.criteria)
+        if back is None or not status.all():
+            return False
+        if np.linalg.norm((back - start).reshape(-1, 2), axis=1).max() > self.fb_max:
+            return False
+
+        # the detector's corners are half a pixel off OpenCV's (pixel corner vs pixel center origin)
+        refined = cv2.cornerSubPix(window, moved - 0.5, self.refine_win, (-1, -1), self.refine_criteria) + 0.5
+        if np.linalg.norm((refined - moved).reshape(-1, 2), axis=1).max() > self.max_snap:
+            return False # no corner where the flow put it
+
+        quads = (refined.reshape(-1, 2) + offset).reshape(-1, 4, 2)
+        if not all(self._consistent(name, quad) for name, quad in zip(names, quads)):
+            return False
+        for name, quad in zip(names, quads):
+            self._update_robot(name, quad, robot_points)
+        return True
+
+    @staticmethod
+    def _sides(corners):
+        return np.linalg.norm(np.roll(corners, -1, axis=0) - corners, axis=1)
+
+    @staticmethod
+    def _turns(corners):
+        # z of the cross product at each corner, all the same sign for a convex quad
+        edges = np.roll(corners, -1, axis=0) - corners
+        following = np.roll(edges, -1, axis=0)
+        return edges[:, 0] * following[:, 1] - edges[:, 1] * following[:, 0]
+
+    def _consistent(self, name, quad):
+        size, winding = self.robot_shapes[name]
+        sides = self._sides(quad)
+        if abs(sides.mean() / size - 1) > self.max_size_change:
+            return False
+        if sides.min() < (1 - 2 * self.max_size_change) * sides.max():
+            return False
+        return bool(np.all(np.sign(self._turns(quad)) == winding))
+
+    def _update_robot(self, name, corners, robot_points, center=None):
+        # Robot tag: Find center and orientation point
+        self.robot_corners[name] = corners
+        robot_points[name]["center"] = quad_center(corners) if center is None else center
+        robot_points[name]["top"] = (corners[0] + corners[1]) / 2
+
+
+TAG_TRACKERS = {"roi": RoiTagTracker, "flow": FlowTagTracker}
+
+
+# tag tracker by name ("roi", "flow"; True means "roi"), None for full-frame detect_apriltags every frame
+def make_tag_tracker(kind, detector, full_every, registry=DEFAULT_REGISTRY):
+    if not kind:
+        return None
+    if kind is True:
+        kind = "roi"
+    return TAG_TRACKERS[kind](detector, full_every=full_every, registry=registry)
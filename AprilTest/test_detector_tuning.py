@@ -0,0 +1,35 @@
+# pytest AprilTest/test_detector_tuning.py
+
+from detector_tuning import AutoTuner, DEFAULT_LEVEL
+
+
+def feed(tuner, latency, score, windows):
+    for _ in range(windows * tuner.window):
+        tuner.record(latency, score)
+
+
+def test_one_slow_window_only_bans_the_level_for_a_while():
+    tuner = AutoTuner(budget=0.030, max_threads=1, window=5, ban_windows=4)
+    feed(tuner, 0.040, 1.0, 1) # one spike: step cheaper and remember the level didn't fit
+    assert tuner.level == DEFAULT_LEVEL + 1 and tuner.ceiling == DEFAULT_LEVEL + 1
+
+    feed(tuner, 0.010, 1.0, 4) # plenty of headroom, but the ban still holds
+    assert tuner.level == DEFAULT_LEVEL + 1
+
+    feed(tuner, 0.010, 1.0, 1)
+    assert tuner.ceiling == 0
+    assert tuner.level == DEFAULT_LEVEL
+
+
+def test_low_score_ban_runs_out():
+    tuner = AutoTuner(budget=0.030, max_threads=1, window=5, ban_windows=4)
+    feed(tuner, 0.040, 1.0, 1) # over budget -> cheaper
+    feed(tuner, 0.040, 0.5, 1) # cheaper level lost half the detections -> undone and banned
+    assert tuner.level == DEFAULT_LEVEL and tuner.floor == DEFAULT_LEVEL
+
+    feed(tuner, 0.040, 1.0, 4) # still over budget, nowhere cheaper to go yet
+    assert tuner.level == DEFAULT_LEVEL
+
+    feed(tuner, 0.040, 1.0, 1)
+    assert tuner.floor == len(tuner.levels) - 1
+    assert tuner.level == DEFAULT_LEVEL + 1
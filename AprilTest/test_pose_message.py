@@ -0,0 +1,112 @@
+# pytest AprilTest/test_pose_message.py
+
+import struct
+import pytest
+
+from pose_message import (encode_pose, decode_pose, encode_field, decode_field, PosePublisher,
+                          POSE_MAGIC, POSE_STRUCT)
+
+ROBOT_IDS = {"robot": 4, "robot2": 300} # past a u8, tag36h11 goes to 586
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+
+def single_pose():
+    return {"robot_found": True, "robot_x": 10.5, "robot_y": 20.25, "robot_theta": -1.5,
+            "ball_found": False, "ball_x": -1.0, "ball_y": -1.0, "h_drift": 0.75, "frame_seq": 42}
+
+
+def test_pose_round_trip_untracked():
+    payload = encode_pose(single_pose(), 7, 1700000000.125, 1700000000.25)
+    assert len(payload) == POSE_STRUCT.size
+    pose = decode_pose(payload)
+
+    assert pose == {"robot_found": True, "robot_x": pytest.approx(10.5), "robot_y": pytest.approx(20.25),
+                    "robot_theta": pytest.approx(-1.5), "ball_found": False, "ball_x": pytest.approx(-1.0),
+                    "ball_y": pytest.approx(-1.0), "h_drift": pytest.approx(0.75),
+                    "seq": 7, "frame_seq": 42, "stamp": 1700000000.125, "sent_stamp": 1700000000.25}
+
+
+def test_pose_round_trip_tracked():
+    tracked = dict(single_pose(), ball_found=True, ball_x=30.0, ball_y=40.0,
+                   robot_vx=5.0, robot_vy=-2.5, robot_omega=0.25, ball_vx=100.0, ball_vy=-50.0,
+                   robot_cov=[1.0, 0.5, 2.0, 0.01], ball_cov=[3.0, -0.5, 4.0])
+    pose = decode_pose(encode_pose(tracked, 8, 0.0, 0.0))
+
+    for key in ("robot_vx", "robot_vy", "robot_omega", "ball_vx", "ball_vy", "ball_x", "ball_y"):
+        assert pose[key] == pytest.approx(tracked[key])
+    assert pose["robot_cov"] == pytest.approx(tracked["robot_cov"])
+    assert pose["ball_cov"] == pytest.approx(tracked["ball_cov"])
+    assert pose["ball_found"] and pose["seq"] == 8
+
+
+def test_pose_rejects_short_and_newer_payloads():
+    payload = encode_pose(single_pose(), 1, 0.0, 0.0)
+    with pytest.raises(ValueError):
+        decode_pose(payload[:-1])
+    with pytest.raises(ValueError):
+        decode_pose(b"F" + payload[1:])
+    newer = struct.pack("<BB", POSE_MAGIC, 99) + payload[2:]
+    with pytest.raises(ValueError, match="version 99"):
+        decode_pose(newer)
+
+
+def test_pose_json_fallback():
+    client = FakeClient()
+    publisher = PosePublisher(client, "robot/position", fmt="json")
+    assert publisher.publish(single_pose(), stamp=12.5)
+    topic, payload = client.published[0]
+    pose = decode_pose(payload.encode()) # MQTT hands the consumer bytes
+
+    assert topic == "robot/position"
+    assert pose["robot_x"] == 10.5 and pose["robot_theta"] == -1.5 and not pose["ball_found"]
+    assert pose["seq"] == 1 and pose["frame_seq"] == 42 and pose["stamp"] == 12.5
+
+
+def field_pose():
+    return {
+        "frame_seq": 1234,
+        "h_drift": 0.75,
+        "robots": {
+            "robot": {"found": True, "x": 10.5, "y": 20.25, "theta": 1.5},
+            "robot2": {"found": False, "x": -1.0, "y": -1.0, "theta": 0.0},
+        },
+        "balls": [[50.0, 60.5], [70.25, 80.0]],
+    }
+
+
+def test_field_round_trip():
+    payload = encode_field(field_pose(), 7, 1700000000.125, 1700000000.25, ROBOT_IDS)
+    field = decode_field(payload)
+
+    assert field["seq"] == 7
+    assert field["frame_seq"] == 1234
+    assert field["stamp"] == 1700000000.125
+    assert field["sent_stamp"] == 1700000000.25
+    assert field["h_drift"] == pytest.approx(0.75)
+    assert field["robots"] == {
+        4: {"found": True, "x": pytest.approx(10.5), "y": pytest.approx(20.25), "theta": pytest.approx(1.5)},
+        300: {"found": False, "x": pytest.approx(-1.0), "y": pytest.approx(-1.0), "theta": pytest.approx(0.0)},
+    }
+    assert field["balls"] == [pytest.approx([50.0, 60.5]), pytest.approx([70.25, 80.0])]
+
+
+def test_field_round_trip_empty():
+    pose = {"robots": {}, "balls": []}
+    field = decode_field(encode_field(pose, 0, 0.0, 0.0, ROBOT_IDS))
+    assert field["robots"] == {} and field["balls"] == []
+    assert field["frame_seq"] == 0 and field["h_drift"] == pytest.approx(-1.0)
+
+
+def test_field_rejects_truncated_and_foreign_payloads():
+    payload = encode_field(field_pose(), 1, 0.0, 0.0, ROBOT_IDS)
+    with pytest.raises(ValueError):
+        decode_field(payload[:-1])
+    with pytest.raises(ValueError):
+        decode_field(b"P" + payload[1:])
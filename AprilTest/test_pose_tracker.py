@@ -0,0 +1,46 @@
+# pytest AprilTest/test_pose_tracker.py
+
+import pytest
+
+from pose_tracker import PoseTracker
+
+
+def moving_pose(t):
+    # robot driving +x at 50 cm/s, ball rolling +y at 100 cm/s
+    return {"robot_found": True, "robot_x": 50.0 * t, "robot_y": 20.0, "robot_theta": 0.0,
+            "ball_found": True, "ball_x": 30.0, "ball_y": 100.0 * t, "h_drift": 0.1}
+
+
+def test_lost_track_holds_after_max_extrapolation():
+    tracker = PoseTracker(max_age=0.5, max_extrapolation=0.1)
+    for i in range(30):
+        t = i / 30
+        tracker.update(moving_pose(t), t)
+    last_t = 29 / 30
+
+    soon = tracker.predict(last_t + 0.05)
+    assert soon["robot_x"] > 50.0 * last_t # still extrapolating inside the horizon
+    assert soon["robot_vx"] == pytest.approx(50.0, rel=0.2)
+
+    edge = tracker.predict(last_t + 0.1)
+    late = tracker.predict(last_t + 0.4) # lost, not dropped yet
+    assert late["robot_found"] and late["ball_found"]
+    assert late["robot_x"] == pytest.approx(edge["robot_x"])
+    assert late["ball_y"] == pytest.approx(edge["ball_y"])
+    assert late["robot_vx"] == 0.0 and late["ball_vy"] == 0.0
+    assert late["robot_cov"][0] > edge["robot_cov"][0] # less sure the longer it's gone
+
+    assert not tracker.predict(last_t + 0.6)["robot_found"]
+
+
+def test_predictions_leave_out_the_unfiltered_field_entries():
+    tracker = PoseTracker()
+    pose = moving_pose(0.0)
+    pose["robots"] = {"robot": {"found": True, "x": 0.0, "y": 20.0, "theta": 0.0},
+                      "robot2": {"found": True, "x": 90.0, "y": 90.0, "theta": 1.0}}
+    pose["balls"] = [[30.0, 0.0], [100.0, 100.0]]
+    tracker.update(pose, 0.0)
+
+    predicted = tracker.predict(1.0) # long after the detection
+    assert "robots" not in predicted and "balls" not in predicted
+    assert predicted["h_drift"] == 0.1
@@ -0,0 +1,57 @@
+# pytest AprilTest/test_tag_tracking.py
+# Runs the pipelined locator over a short rendered recording with each tag tracker and checks
+# the periodic stats report (which used to assume RoiTagTracker's counters) gets printed.
+
+import cv2
+import pyapriltags as apriltag
+import pytest
+
+from frame_source import open_source
+from homography import HomographyManager
+from pose_message import PosePublisher
+from tag_registry import DEFAULT_REGISTRY
+from tag_tracking import make_tag_tracker
+from bench_tag_tracking import synthetic_clip
+import locate_refactored
+
+
+class FakeClient:
+    def __init__(self):
+        self.published = []
+
+    def publish(self, topic, payload, qos=0, retain=False):
+        self.published.append((topic, payload))
+
+
+@pytest.fixture(scope="module")
+def recording(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("replay") / "clip.avi")
+    writer = None
+    for frame in synthetic_clip(40):
+        if writer is None:
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (frame.shape[1], frame.shape[0]))
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+@pytest.mark.parametrize("kind", ["roi", "flow"])
+def test_pipelined_stats_report_tag_tracker(recording, kind, monkeypatch, capsys):
+    monkeypatch.setattr(locate_refactored, "STATS_INTERVAL", 0) # report after every frame
+    detector = apriltag.Detector()
+    tag_tracker = make_tag_tracker(kind, detector, 5, DEFAULT_REGISTRY)
+    homography = HomographyManager(locate_refactored.target_points, path=None)
+    locator = locate_refactored.Locator(detector, homography, locate_refactored.lower_orange,
+                                        locate_refactored.upper_orange, locate_refactored.kernel, tag_tracker)
+    client = FakeClient()
+    cap = open_source(recording, speed="native")
+
+    locate_refactored.run_pipelined(cap, locator, PosePublisher(client, "robot/position"))
+    cap.release()
+
+    out = capsys.readouterr().out
+    assert f"  tag search: {tag_tracker.summary()}" in out
+    assert tag_tracker.full_count > 0
+    if kind == "flow":
+        assert tag_tracker.flow_count > 0
+    assert client.published
@@ -1,8 +1,14 @@
+# run from the repo root: python -m ImageProcess.MoveIt (the frame sources are AprilTest/frame_source.py)
 import cv2 as cv
 import time
+from AprilTest.frame_source import open_source
+from ImageProcess.background_video import BackgroundVideo
+
+VIDEO_SOURCE = 0 # webcam index, or path to a recording to replay
+RECORD_TO = None # e.g. "moveit_session.avi" to record the webcam feed
  
 # start video cap on webcam
-cap = cv.VideoCapture(0)
+cap = open_source(VIDEO_SOURCE, record_to=RECORD_TO)
 if not cap.isOpened():
     print("cannot open cam")
     exit()
@@ -11,8 +17,6 @@ if not cap.isOpened():
 frame_width = int(cap.get(3))
 frame_height = int(cap.get(4))
 fps = cap.get(cv.CAP_PROP_FPS)
-# start background video
-bg_vid = cv.VideoCapture('bgVID.mp4')
 # initialize video writer
 fourcc = cv.VideoWriter_fourcc(*'mp4v')
 out = cv.VideoWriter("output.mp4", fourcc, fps, (frame_width, frame_height))
@@ -30,29 +34,31 @@ if not ret1:
 frame1 = cv.cvtColor(frame1, cv.COLOR_BGR2GRAY)
 inverted = cv.bitwise_not(frame1)
 
+# start background video, decoded / resized to the webcam size / inverted ahead of time and looped
+bg_vid = BackgroundVideo('bgVID.mp4', (frame1.shape[1], frame1.shape[0]))
+if not bg_vid.isOpened():
+    print("cannot open background video")
+    exit()
+
 
 mask_range = 10
 
 while True:
     # Capture frame-by-frame
     ret, frame = cap.read()
+    if not ret:
+        print("Can't receive frame from webcam (stream end?). Exiting ...")
+        break
     # save original video
     out_orig.write(frame)
     # grayscale and flip
     frame = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)  
     frame = cv.flip(frame, 1)
-    # read current frame of background video
-    ret2, img = bg_vid.read()
-    # Restart video when it ends
+    # current frame of background video, already resized and inverted
+    ret2, img, img_inv = bg_vid.read()
     if not ret2:
-        bg_vid.set(cv.CAP_PROP_POS_FRAMES, 0)
-        continue
-    if not ret:
-        print("Can't receive frame from webcam (stream end?). Exiting ...")
+        print("Background video stopped. Exiting ...")
         break
-    # match background size to the webcam
-    img = cv.resize(img, (frame.shape[1], frame.shape[0]))
-    img_inv = cv.bitwise_not(img)
 
     # blend the past inverted and current normal frames to get motion-based image
     blended = cv.addWeighted(frame, 0.5, inverted, 0.5, 0)
@@ -78,6 +84,7 @@ while True:
 
 # When everything done, release the capture
 cap.release()
+bg_vid.release()
 out.release()
 out_orig.release()
 cv.destroyAllWindows()
\ No newline at end of file
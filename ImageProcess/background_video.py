@@ -0,0 +1,126 @@
+# Background layer for MoveIt.py: a looping video, resized and inverted ahead of the display loop.
+
+import threading
+import cv2
+import numpy as np
+
+
+class BackgroundVideo:
+    """
+    Loops a video as a background layer: every read() returns the next frame
+    resized to `size` (width, height) and its bitwise_not, both prepared ahead
+    of time.
+
+    A clip whose frames (both versions) fit in `max_cache_mb` is decoded once
+    into memory and played from there. A longer one is decoded by a prefetch
+    thread into a ring of `buffer_size` preallocated slots. That thread wraps
+    back to frame 0 itself at the end of the file, so the seek never lands in
+    the display loop. If the decoder falls behind, read() repeats the last
+    frame instead of waiting (counted in `repeats`). The arrays returned are
+    reused, so don't draw on them or keep them past the next read().
+    """
+
+    def __init__(self, path, size, buffer_size=16, max_cache_mb=256):
+        self.path = path
+        self.size = tuple(size)
+        self.cap = cv2.VideoCapture(path)
+        self.frames = None  # [(frame, inverted)] when the whole clip is cached
+        self.index = 0
+        self.repeats = 0
+        self.thread = None
+        if not self.cap.isOpened():
+            return
+
+        frame_bytes = 2 * 3 * self.size[0] * self.size[1]
+        count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if 0 < count * frame_bytes <= max_cache_mb * 1e6:
+            self.frames = self._preload(int(max_cache_mb * 1e6 // frame_bytes))
+            if self.frames is None: # frame count was off, stream it after all
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        if self.frames is None:
+            width, height = self.size
+            self.slots = [(np.empty((height, width, 3), np.uint8), np.empty((height, width, 3), np.uint8))
+                          for _ in range(buffer_size)]
+            self._cond = threading.Condition()
+            self._head = 0       # next filled slot to hand out
+            self._count = 0      # filled slots not handed out yet
+            self._held = False   # slot before _head was handed out by the last read()
+            self.running = True
+            self.thread = threading.Thread(target=self._prefetch, name="background-video", daemon=True)
+            self.thread.start()
+        print(f"background {path}: " + (f"{len(self.frames)} frames cached" if self.frames is not None
+                                        else f"streaming, {buffer_size} frame buffer"))
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _prepare(self, frame, out=None):
+        if out is None:
+            resized = cv2.resize(frame, self.size)
+            return resized, cv2.bitwise_not(resized)
+        cv2.resize(frame, self.size, dst=out[0])
+        cv2.bitwise_not(out[0], dst=out[1])
+        return out
+
+    def _preload(self, max_frames):
+        frames = []
+        while True:
+            ret, frame = self.cap.read()
+            if not ret:
+                return frames or None
+            if len(frames) == max_frames:
+                return None
+            frames.append(self._prepare(frame))
+
+    def _prefetch(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = self.cap.read()
+                if not ret:
+                    break
+            with self._cond:
+                self._cond.wait_for(lambda: self._count + self._held < len(self.slots) or not self.running)
+                if not self.running:
+                    break
+                slot = self.slots[(self._head + self._count) % len(self.slots)]
+            # only this thread touches a free slot, fill it outside the lock
+            self._prepare(frame, out=slot)
+            with self._cond:
+                self._count += 1
+                self._cond.notify_all()
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+
+    def read(self):
+        """(ok, frame, inverted) for the next background frame"""
+        if self.frames is not None:
+            frame, inverted = self.frames[self.index]
+            self.index = (self.index + 1) % len(self.frames)
+            return True, frame, inverted
+        if self.thread is None:
+            return False, None, None
+        with self._cond:
+            if self._count == 0 and self._held:
+                self.repeats += 1 # decoder is behind, show the last frame again
+                frame, inverted = self.slots[(self._head - 1) % len(self.slots)]
+                return True, frame, inverted
+            self._cond.wait_for(lambda: self._count > 0 or not self.running)
+            if self._count == 0:
+                return False, None, None
+            self._held = True # frees the previously held slot, which sits before this one
+            frame, inverted = self.slots[self._head]
+            self._head = (self._head + 1) % len(self.slots)
+            self._count -= 1
+            self._cond.notify_all()
+            return True, frame, inverted
+
+    def release(self):
+        if self.thread is not None:
+            with self._cond:
+                self.running = False
+                self._cond.notify_all()
+            self.thread.join(timeout=2.0)
+        self.cap.release()
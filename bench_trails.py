@@ -0,0 +1,58 @@
+# Micro-benchmark of detect_hands.py's trail drawing: the old one-cv2.line-per-segment loop
+# against trail_render.draw_trail (one cv2.polylines call per thickness), for two random-walk
+# fingertip trails on a 960x540 frame at several trail lengths. Also checks both draw the
+# same pixels.
+#
+# usage: python bench_trails.py [--lengths 80,300,1000] [--frames 300]
+
+import argparse
+import random
+import time
+import numpy as np
+from trail_render import draw_trail, draw_trail_segments
+
+FRAME_SHAPE = (540, 960, 3)
+
+
+def random_trail(rng, n):
+    # random.Random, not numpy.random: the repo's secrets.py shadows the stdlib module numpy.random needs
+    x, y, trail = 480.0, 270.0, []
+    for _ in range(n):
+        x = min(max(x + rng.gauss(0, 6), 0), 959)
+        y = min(max(y + rng.gauss(0, 6), 0), 539)
+        trail.append((int(x), int(y)))
+    return trail
+
+
+def time_draw(draw, trails, max_len, frames):
+    img = np.zeros(FRAME_SHAPE, dtype=np.uint8)
+    t0 = time.perf_counter()
+    for _ in range(frames):
+        for trail in trails:
+            draw(img, trail, max_len)
+    return (time.perf_counter() - t0) / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-segment vs batched trail drawing")
+    parser.add_argument("--lengths", default="80,300,1000", help="comma separated TRAIL_LEN values")
+    parser.add_argument("--frames", type=int, default=300, help="frames drawn per method and length")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'TRAIL_LEN':>9} {'lines ms':>9} {'polylines ms':>13} {'speedup':>8} {'diff px':>8}")
+    for max_len in [int(n) for n in args.lengths.split(",")]:
+        trails = [random_trail(rng, max_len), random_trail(rng, max_len)]
+        old = time_draw(draw_trail_segments, trails, max_len, args.frames)
+        new = time_draw(draw_trail, trails, max_len, args.frames)
+
+        a, b = np.zeros(FRAME_SHAPE, dtype=np.uint8), np.zeros(FRAME_SHAPE, dtype=np.uint8)
+        for trail in trails:
+            draw_trail_segments(a, trail, max_len)
+            draw_trail(b, trail, max_len)
+        diff = np.count_nonzero((a != b).any(axis=2))
+        print(f"{max_len:9d} {1000 * old:9.3f} {1000 * new:13.3f} {old / new:7.1f}x {diff:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,10 @@ import os, ssl, json, time
 from collections import deque
 import cv2, paho.mqtt.client as mqtt
 import mediapipe as mp
+from AprilTest.frame_source import open_source, is_replay
+from hand_inference import HandInferenceWorker
+from one_euro import OneEuroFilter
+from trail_render import draw_trail
 
 # -------- MQTT --------
 BROKER   = "71b19996472b44ef8901c930925513fd.s1.eu.hivemq.cloud"
@@ -33,11 +37,12 @@ client.connect(BROKER, PORT, keepalive=60)
 client.loop_start()
 
 # -------- Camera / Window (macOS friendly) --------
-CAM_INDEX = 0
+CAM_INDEX = 0          # or path to a recording to replay
+RECORD_TO = None       # e.g. "hands.avi" to record the live feed
 API = cv2.CAP_AVFOUNDATION
-cap = cv2.VideoCapture(CAM_INDEX, API)
+cap = open_source(CAM_INDEX, record_to=RECORD_TO, api=API)
 if not cap.isOpened():
-    cap.release(); cap = cv2.VideoCapture(CAM_INDEX)
+    cap.release(); cap = open_source(CAM_INDEX, record_to=RECORD_TO)
 if not cap.isOpened():
     raise SystemExit("Could not open camera. Check permissions / device index.")
 
@@ -47,8 +52,8 @@ cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 540)
 cap.set(cv2.CAP_PROP_BUFFERSIZE,   1)   # reduce latency
 
 ok, frame = cap.read()
-frame = cv2.flip(frame, 1)
 if not ok or frame is None: raise SystemExit("First frame failed.")
+frame = cv2.flip(frame, 1)
 
 try: cv2.startWindowThread()
 except: pass
@@ -59,11 +64,28 @@ cv2.imshow(WIN, frame); cv2.waitKey(1)
 
 # -------- MediaPipe --------
 ENABLE_MP = True
+MODEL_COMPLEXITY = 1   # starting model, 0 = light, 1 = full
+ADAPTIVE_MODEL = True  # drop to the light model when inference falls under MP_LOW_FPS
+MP_LOW_FPS, MP_HIGH_FPS = 15.0, 30.0
+MP_RETRY_AFTER = 30.0  # seconds before the full model is tried again after it was too slow
+HAND_ROI = True        # after a hand is found, only run MediaPipe on a crop around it
+ROI_SIZE = 256         # crop is resized to ROI_SIZE x ROI_SIZE before inference
+ROI_PAD = 1.5          # crop side = hand box side * ROI_PAD
+ROI_FULL_EVERY = 15    # full-frame search every N frames so a second hand gets found
 mp_hands  = mp.solutions.hands
 mp_draw   = mp.solutions.drawing_utils
 mp_styles = mp.solutions.drawing_styles
-hands = mp_hands.Hands(static_image_mode=False, max_num_hands=2, model_complexity=1,
-                       min_detection_confidence=0.6, min_tracking_confidence=0.6)
+
+def make_hands(complexity):
+    return mp_hands.Hands(static_image_mode=False, max_num_hands=2, model_complexity=complexity,
+                          min_detection_confidence=0.6, min_tracking_confidence=0.6)
+
+# inference runs in its own thread on the newest frame, the loop below draws the latest result
+worker = HandInferenceWorker(make_hands, complexity=MODEL_COMPLEXITY, adaptive=ADAPTIVE_MODEL,
+                             low_fps=MP_LOW_FPS, high_fps=MP_HIGH_FPS, retry_after=MP_RETRY_AFTER, roi=HAND_ROI,
+                             roi_size=ROI_SIZE, roi_pad=ROI_PAD, full_every=ROI_FULL_EVERY)
+worker.start()
+last_result_seq = 0
 
 # -------- UI / publish helpers --------
 TRAIL_LEN = 80
@@ -72,37 +94,77 @@ last_time, acc_t, acc_n = time.time(), 0.0, 0
 fps = 0.0
 ANGLE_LIMIT = 20
 MAX_HZ = 15.0
-DEADBAND_DEG = 2
-last_send_t, last_angle = 0.0, None
+DEADBAND_DEG = 1      # the filter takes out the jitter, this only stops resending the same angle
+# One Euro filter per hand (MediaPipe's handedness label, the frame is mirrored so it's the real hand):
+# min_cutoff Hz smoothing at rest, beta cutoff rise per deg/s, lead s of prediction ahead
+# (lead ~0.05 makes up for the inference delay on fast moves but lets more jitter through at rest)
+HAND_FILTERS = {
+    "Left":  dict(min_cutoff=0.5, beta=0.2, lead=0.0),
+    "Right": dict(min_cutoff=0.5, beta=0.2, lead=0.0),
+}
+PRIMARY_HAND = "Right" # sent as "angle" for single-servo receivers, the other hand if it's missing
+filters = {label: OneEuroFilter(**params) for label, params in HAND_FILTERS.items()}
+hand_angles = {label: 0.0 for label in HAND_FILTERS}  # filtered angle per hand, 0 (center) when not seen
+hands_seen = set()                                    # hands in the latest result
+last_send_t, last_angles = 0.0, None
 
 def clamp(v, lo, hi): return lo if v < lo else hi if v > hi else v
 def put(img, text, y): cv2.putText(img, text, (10,y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,0), 2, cv2.LINE_AA)
 
-def maybe_publish_angle(angle):
-    global last_send_t, last_angle
+def update_hand_angles(result, t):
+    """Filter each hand's raw fingertip angle from a new result; hands not seen are reset to center"""
+    hands_seen.clear()
+    if result is not None and result.multi_hand_landmarks:
+        for handLms, handedness in zip(result.multi_hand_landmarks, result.multi_handedness):
+            label = handedness.classification[0].label
+            if label not in filters or label in hands_seen: continue
+            hands_seen.add(label)
+            tip_off_center = (handLms.landmark[8].x - 0.5) * 2.0
+            raw = clamp(tip_off_center * ANGLE_LIMIT, -ANGLE_LIMIT, ANGLE_LIMIT)
+            hand_angles[label] = clamp(filters[label](raw, t), -ANGLE_LIMIT, ANGLE_LIMIT)
+    for label in filters:
+        if label not in hands_seen:
+            filters[label].reset(); hand_angles[label] = 0.0
+
+def maybe_publish_angles():
+    global last_send_t, last_angles
     if not ENABLE_MQTT: return
     now = time.time()
     if now - last_send_t < 1.0 / MAX_HZ: return
-    if last_angle is not None and abs(angle - last_angle) < DEADBAND_DEG: return
-    payload = json.dumps({"type":"servo","angle": int(angle)})
+    angles = {label: int(round(a)) for label, a in hand_angles.items()}
+    if last_angles is not None and all(abs(angles[k] - last_angles[k]) < DEADBAND_DEG for k in angles): return
+    primary = PRIMARY_HAND if PRIMARY_HAND in hands_seen or not hands_seen else next(iter(hands_seen))
+    payload = json.dumps({"type":"servo", "angle": angles[primary],
+                          "angleL": angles.get("Left", 0), "angleR": angles.get("Right", 0)})
     # non-blocking publish
     client.publish(TOPIC, payload, qos=SEND_QOS)
-    last_angle, last_send_t = angle, now
+    last_angles, last_send_t = angles, now
 
 print("[INFO] Running. Press m to toggle MediaPipe, p to toggle MQTT, q to quit.")
 
 try:
     while True:
         ok, frame = cap.read()
+        if not ok:
+            if is_replay(cap): print("[INFO] End of recording."); break
+            print("[WARN] Frame grab failed."); continue
         frame = cv2.flip(frame, 1)
-        if not ok: print("[WARN] Frame grab failed."); continue
 
         h, w = frame.shape[:2]
-        angle = 0
 
         if ENABLE_MP:
-            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            result = hands.process(rgb)
+            # the worker crops / converts it itself, hand it a copy so drawing below can't race it
+            worker.submit(frame.copy())
+            latest = worker.latest()
+        else:
+            latest = None
+            if hands_seen: update_hand_angles(None, 0.0) # back to center
+
+        if latest is not None:
+            result_seq, result_time, result = latest
+            new_result = result_seq != last_result_seq # only extend trails / filters once per inference
+            last_result_seq = result_seq
+            if new_result: update_hand_angles(result, result_time)
             if result.multi_hand_landmarks:
                 for i, handLms in enumerate(result.multi_hand_landmarks):
                     mp_draw.draw_landmarks(
@@ -112,19 +174,11 @@ try:
                     )
                     tip = handLms.landmark[8]
                     x_pix, y_pix = int(tip.x * w), int(tip.y * h)
-                    trails[i].append((x_pix, y_pix))
-                    tip_off_center = (tip.x - 0.5) * 2.0
-                    angle = int(clamp(tip_off_center * ANGLE_LIMIT, -ANGLE_LIMIT, ANGLE_LIMIT))
-            else:
-                # optional: center when no hand
-                angle = 0
-
-        # trails
+                    if new_result: trails[i].append((x_pix, y_pix))
+
+        # trails, one polylines call per thickness (bench_trails.py)
         for dq in trails.values():
-            for j in range(1, len(dq)):
-                if dq[j-1] is None or dq[j] is None: continue
-                thickness = max(1, int(6 * (j/TRAIL_LEN)))
-                cv2.line(frame, dq[j-1], dq[j], (0,255,255), thickness)
+            draw_trail(frame, dq, TRAIL_LEN, (0,255,255))
 
         # fps
         now = time.time(); dt = now - last_time; last_time = now
@@ -133,8 +187,10 @@ try:
 
         put(frame, f"FPS: {fps:.1f}  MP:{int(ENABLE_MP)} MQTT:{int(ENABLE_MQTT)}", 28)
         put(frame, "q=quit  c=clear  s=snap  m=toggle MP  p=toggle MQTT", 56)
+        if ENABLE_MP: put(frame, worker.summary(), 84)
+        put(frame, "  ".join(f"{label}: {a:+5.1f}" for label, a in hand_angles.items()), 112)
         cv2.imshow(WIN, frame)
-        maybe_publish_angle(angle)
+        maybe_publish_angles()
 
         key = cv2.waitKey(1) & 0xFF
         if key == ord('q'): break
@@ -150,7 +206,8 @@ except KeyboardInterrupt:
     print("Interrupted.")
 
 finally:
-    hands.close()
+    worker.stop()
+    print("[MP]", worker.summary(), f"| model switches {worker.switches}")
     cap.release()
     cv2.destroyAllWindows()
     client.loop_stop(); client.disconnect()
@@ -0,0 +1,198 @@
+# MediaPipe hand inference off the capture/display thread.
+# The display loop submits every frame, the worker only ever runs the newest one
+# (older unprocessed frames are dropped and counted), and the loop draws whatever
+# result is latest, so the window and MQTT run at camera rate whatever inference costs.
+
+import threading
+import time
+from collections import deque
+import cv2
+
+
+def hand_box(result, shape, pad=1.5, min_side=96):
+    """Square (x0, y0, side) in pixels around all hands' landmarks, padded by `pad` and kept inside the frame"""
+    height, width = shape[:2]
+    xs = [lm.x * width for hand in result.multi_hand_landmarks for lm in hand.landmark]
+    ys = [lm.y * height for hand in result.multi_hand_landmarks for lm in hand.landmark]
+    side = max(max(xs) - min(xs), max(ys) - min(ys)) * pad
+    side = int(min(max(side, min_side), width, height))
+    cx, cy = (min(xs) + max(xs)) / 2, (min(ys) + max(ys)) / 2
+    x0 = int(min(max(cx - side / 2, 0), width - side))
+    y0 = int(min(max(cy - side / 2, 0), height - side))
+    return x0, y0, side
+
+
+def map_to_frame(result, box, shape):
+    """Turn landmarks normalized to the crop `box` into landmarks normalized to the full frame, in place"""
+    height, width = shape[:2]
+    x0, y0, side = box
+    for hand in result.multi_hand_landmarks:
+        for lm in hand.landmark:
+            lm.x = (x0 + lm.x * side) / width
+            lm.y = (y0 + lm.y * side) / height
+
+
+class HandInferenceWorker(threading.Thread):
+    """
+    Runs hands.process() on the newest submitted frame in a background thread.
+
+    With roi=True, once hands are found it only feeds MediaPipe a square crop
+    around the previous result (hand_box), resized to roi_size x roi_size,
+    and maps the landmarks back to full-frame coordinates. When the crop
+    loses the hands the same frame is searched again in full, so a fast move
+    or brief occlusion doesn't read as "no hands". There is also a full-frame
+    pass every `full_every` frames so a hand entering elsewhere still gets
+    picked up. Full frames and
+    crops use separate Hands objects so their tracking state doesn't mix.
+
+    make_hands(complexity) builds a mediapipe Hands object for model_complexity
+    0 or 1. The worker watches its own inference rate and drops to the light
+    model when it falls under `low_fps`. It goes back to the full model once
+    the light one runs above `high_fps` and the full model is expected to keep
+    up: its last measured rate is remembered, but only for `retry_after`
+    seconds, so a slow spell (startup, another app loading the laptop) doesn't
+    pin it to the light model for good. `cooldown` seconds between switches
+    stops it flapping.
+    """
+
+    def __init__(self, make_hands, complexity=1, adaptive=True, low_fps=15.0, high_fps=30.0,
+                 cooldown=3.0, retry_after=30.0, window=30, roi=False, roi_size=256, roi_pad=1.5, full_every=15):
+        super().__init__(name="hand-inference", daemon=True)
+        self.make_hands = make_hands
+        self.complexity = complexity
+        self.adaptive = adaptive
+        self.low_fps = low_fps
+        self.high_fps = high_fps
+        self.cooldown = cooldown
+        self.retry_after = retry_after
+        self.roi = roi
+        self.roi_size = roi_size
+        self.roi_pad = roi_pad
+        self.full_every = full_every
+        self.box = None         # (x0, y0, side) crop for the next frame, None = full frame
+        self._since_full = 0
+
+        self._cond = threading.Condition()
+        self._pending = None    # (seq, capture_time, frame) waiting for the worker
+        self._latest = None     # (seq, capture_time, result) of the last finished frame
+        self.running = True
+
+        self.submitted = 0
+        self.processed = 0
+        self.dropped = 0        # frames replaced by a newer one before the worker got to them
+        self.switches = 0
+        self.full_count = 0
+        self.roi_count = 0
+        self.roi_misses = 0     # crops that lost the hands, the frame was then searched in full
+        self.infer_times = deque(maxlen=window)  # seconds inside hands.process()
+        self.latency = deque(maxlen=window)      # seconds from capture to result
+        self.model_fps = {}                      # complexity -> (last measured inference fps, when)
+        self._last_switch = time.perf_counter()
+
+    def submit(self, frame, capture_time=None):
+        """Hand over a BGR frame the caller won't draw on; replaces (and counts as dropped) one the worker hasn't started on"""
+        with self._cond:
+            self.submitted += 1
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (self.submitted, capture_time or time.perf_counter(), frame)
+            self._cond.notify()
+
+    def latest(self):
+        """(seq, capture_time, result) of the newest finished frame, or None before the first one"""
+        with self._cond:
+            return self._latest
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        self.join(timeout=2.0)
+
+    def inference_fps(self):
+        times = list(self.infer_times)
+        return len(times) / sum(times) if times and sum(times) > 0 else 0.0
+
+    def run(self):
+        hands = self.make_hands(self.complexity)
+        crop_hands = self.make_hands(self.complexity) if self.roi else None
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._pending is not None or not self.running)
+                    if not self.running:
+                        break
+                    seq, capture_time, frame = self._pending
+                    self._pending = None
+
+                t0 = time.perf_counter()
+                result = self._process(frame, hands, crop_hands)
+                t1 = time.perf_counter()
+                self.infer_times.append(t1 - t0)
+                self.latency.append(t1 - capture_time)
+                self.processed += 1
+                with self._cond:
+                    self._latest = (seq, capture_time, result)
+
+                if self.adaptive:
+                    complexity = self._pick_complexity(t1)
+                    if complexity != self.complexity:
+                        hands.close()
+                        print(f"[MP] model_complexity {self.complexity} -> {complexity} "
+                              f"(inference {self.inference_fps():.1f} fps)")
+                        self.complexity = complexity
+                        hands = self.make_hands(complexity)
+                        if crop_hands is not None:
+                            crop_hands.close()
+                            crop_hands = self.make_hands(complexity)
+                        self.infer_times.clear()
+                        self.switches += 1
+                        self._last_switch = time.perf_counter()
+        finally:
+            hands.close()
+            if crop_hands is not None:
+                crop_hands.close()
+
+    def _process(self, frame, hands, crop_hands):
+        use_roi = self.roi and self.box is not None and (self.full_every <= 0 or self._since_full < self.full_every - 1)
+        if use_roi:
+            x0, y0, side = self.box
+            crop = cv2.resize(frame[y0:y0 + side, x0:x0 + side], (self.roi_size, self.roi_size), interpolation=cv2.INTER_AREA)
+            result = crop_hands.process(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
+            self.roi_count += 1
+            self._since_full += 1
+            if result.multi_hand_landmarks:
+                map_to_frame(result, self.box, frame.shape)
+            else:
+                self.roi_misses += 1
+                use_roi = False
+        if not use_roi:
+            result = hands.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            self.full_count += 1
+            self._since_full = 0
+        if self.roi:
+            self.box = hand_box(result, frame.shape, self.roi_pad) if result.multi_hand_landmarks else None
+        return result
+
+    def _pick_complexity(self, now):
+        if len(self.infer_times) < self.infer_times.maxlen or now - self._last_switch < self.cooldown:
+            return self.complexity
+        fps = self.inference_fps()
+        self.model_fps[self.complexity] = (fps, now)
+        if self.complexity == 1 and fps < self.low_fps:
+            return 0
+        if self.complexity == 0 and fps > self.high_fps:
+            full = self.model_fps.get(1)
+            if full is None or full[0] > self.low_fps * 1.2 or now - full[1] > self.retry_after:
+                return 1
+        return self.complexity
+
+    def summary(self):
+        latency = list(self.latency)
+        text = f"MP c{self.complexity}: {self.inference_fps():4.1f} fps"
+        if latency:
+            text += f" | latency {1000 * sum(latency) / len(latency):5.1f} ms (max {1000 * max(latency):5.1f})"
+        text += f" | dropped {self.dropped}/{self.submitted}"
+        if self.roi:
+            text += f" | roi {self.roi_count} full {self.full_count}"
+        return text
@@ -0,0 +1,46 @@
+# One Euro filter (Casiez et al. 2012): a low-pass filter whose cutoff rises with speed,
+# so a hand held still gets heavily smoothed (no jitter) while real motion comes through
+# with little lag. Optionally leads the output by the filtered velocity to cover the
+# inference + MQTT delay.
+
+import math
+
+
+def smoothing_factor(dt, cutoff):
+    r = 2 * math.pi * cutoff * dt
+    return r / (r + 1)
+
+
+class OneEuroFilter:
+    """
+    Filters one value over time. min_cutoff (Hz) sets the smoothing at rest,
+    beta how fast the cutoff rises with speed (units of the value per second),
+    d_cutoff (Hz) the smoothing of the speed estimate. lead (s) adds
+    lead * velocity to the output, a prediction of where the value will be.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0, lead=0.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.lead = lead
+        self.reset()
+
+    def reset(self):
+        self.x = None   # filtered value
+        self.dx = 0.0   # filtered velocity
+        self.t = None
+
+    def __call__(self, x, t):
+        """Add sample x taken at time t (s), return the filtered (and led) value"""
+        if self.x is None:
+            self.x, self.t = x, t
+            return x
+        dt = t - self.t
+        if dt > 0:
+            a_d = smoothing_factor(dt, self.d_cutoff)
+            self.dx = a_d * (x - self.x) / dt + (1 - a_d) * self.dx
+            a = smoothing_factor(dt, self.min_cutoff + self.beta * abs(self.dx))
+            self.x = a * x + (1 - a) * self.x
+            self.t = t
+        return self.x + self.lead * self.dx
@@ -0,0 +1,96 @@
+# pytest test_hand_inference.py
+# HandInferenceWorker against a fake mediapipe Hands whose inference time per model is set by the test.
+
+import time
+from types import SimpleNamespace
+import numpy as np
+
+from hand_inference import HandInferenceWorker
+
+
+class FakeHands:
+    delays = {0: 0.002, 1: 0.002}  # seconds per process() call for each model_complexity
+
+    def __init__(self, complexity):
+        self.complexity = complexity
+
+    def process(self, rgb):
+        time.sleep(self.delays[self.complexity])
+        return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+
+    def close(self):
+        pass
+
+
+def feed_until(worker, condition, timeout=5.0):
+    frame = np.zeros((54, 96, 3), dtype=np.uint8)
+    end = time.perf_counter() + timeout
+    while time.perf_counter() < end:
+        if condition():
+            return True
+        worker.submit(frame)
+        time.sleep(0.001)
+    return condition()
+
+
+def test_adaptive_model_drops_and_comes_back():
+    FakeHands.delays = {0: 0.002, 1: 0.03}  # full model ~33 fps: too slow for low_fps=50
+    worker = HandInferenceWorker(FakeHands, complexity=1, low_fps=50.0, high_fps=100.0,
+                                 cooldown=0.1, retry_after=0.3, window=5)
+    worker.start()
+    try:
+        assert feed_until(worker, lambda: worker.complexity == 0)
+
+        # the slow spell is over, but the full model's bad rate is still remembered
+        FakeHands.delays[1] = 0.004
+        feed_until(worker, lambda: False, timeout=0.15)
+        assert worker.complexity == 0
+
+        # once that estimate expires the worker tries the full model again and keeps it
+        assert feed_until(worker, lambda: worker.complexity == 1)
+        feed_until(worker, lambda: False, timeout=0.5)
+        assert worker.complexity == 1
+        assert worker.switches == 2
+    finally:
+        worker.stop()
+
+
+class BlobHands:
+    """Fake Hands that "finds" a hand where the image is bright, landmarks at the blob's corners"""
+
+    def __init__(self, complexity):
+        pass
+
+    def process(self, rgb):
+        ys, xs = np.nonzero(rgb[..., 0] > 200)
+        if len(xs) == 0:
+            return SimpleNamespace(multi_hand_landmarks=None, multi_handedness=None)
+        height, width = rgb.shape[:2]
+        landmarks = [SimpleNamespace(x=x / width, y=y / height) for x, y in [(xs.min(), ys.min()), (xs.max(), ys.max())]]
+        return SimpleNamespace(multi_hand_landmarks=[SimpleNamespace(landmark=landmarks)], multi_handedness=None)
+
+    def close(self):
+        pass
+
+
+def hand_frame(x, y):
+    frame = np.zeros((540, 960, 3), dtype=np.uint8)
+    frame[y:y + 60, x:x + 50] = 255
+    return frame
+
+
+def test_roi_miss_falls_back_to_full_frame_on_the_same_frame():
+    worker = HandInferenceWorker(BlobHands, adaptive=False, roi=True, full_every=100)
+    hands, crop_hands = BlobHands(1), BlobHands(1)
+
+    first = worker._process(hand_frame(100, 200), hands, crop_hands) # full frame, finds the hand
+    assert first.multi_hand_landmarks and worker.box is not None
+    tracked = worker._process(hand_frame(110, 200), hands, crop_hands) # inside the crop
+    assert tracked.multi_hand_landmarks and worker.roi_count == 1
+
+    # the hand jumps far outside the crop: still found, from the full frame
+    jumped = worker._process(hand_frame(800, 400), hands, crop_hands)
+    assert jumped.multi_hand_landmarks
+    assert jumped.multi_hand_landmarks[0].landmark[0].x * 960 == 800
+    assert worker.roi_misses == 1 and worker.full_count == 2 and worker._since_full == 0
+    assert worker.box[0] <= 800 < worker.box[0] + worker.box[2]
@@ -0,0 +1,40 @@
+# Fingertip trail drawing for detect_hands.py.
+# A trail is drawn thin at the old end and thicker towards the newest point, segment j
+# (points j-1 -> j) being max(1, int(max_thickness * j / max_len)) px. That thickness only
+# grows along the trail, so all segments of one thickness are one contiguous run and the
+# whole trail takes one cv2.polylines call per thickness (<= max_thickness calls) instead
+# of one cv2.line call per segment.
+
+from functools import lru_cache
+import cv2
+import numpy as np
+
+
+@lru_cache(maxsize=64)
+def thickness_runs(n_points, max_len, max_thickness=6):
+    """[(thickness, first, last)] for a trail of n_points: segments first..last-1 (1-based j) share thickness"""
+    runs = []
+    for j in range(1, n_points):
+        thickness = max(1, int(max_thickness * (j / max_len)))
+        if runs and runs[-1][0] == thickness:
+            runs[-1][2] = j + 1
+        else:
+            runs.append([thickness, j, j + 1])
+    return tuple(tuple(run) for run in runs)
+
+
+def draw_trail(img, points, max_len, color=(0, 255, 255), max_thickness=6):
+    """Draw a trail (sequence of (x, y), oldest first) the same as per-segment cv2.line calls would"""
+    if len(points) < 2:
+        return
+    pts = np.asarray(points, dtype=np.int32)
+    for thickness, first, last in thickness_runs(len(pts), max_len, max_thickness):
+        cv2.polylines(img, [pts[first - 1:last]], False, color, thickness)
+
+
+def draw_trail_segments(img, points, max_len, color=(0, 255, 255), max_thickness=6):
+    """The original one-cv2.line-per-segment drawing, kept as the benchmark reference"""
+    for j in range(1, len(points)):
+        if points[j-1] is None or points[j] is None: continue
+        thickness = max(1, int(max_thickness * (j/max_len)))
+        cv2.line(img, points[j-1], points[j], color, thickness)